@@ -27,6 +27,9 @@ interface Application {
   scheme_id: string
   status: string
   submitted_at: string
+  scheme_name?: string
+  applicant_name?: string
+  applicant_state?: string
 }
 
 interface Scheme {
@@ -48,7 +51,8 @@ export default function AdminPage() {
     'https://ai-scheme-application-web.onrender.com'
 
   const [editRequests, setEditRequests] = useState<EditRequest[]>([])
-  const [applications, setApplications] = useState<Application[]>([])
+  const [pendingApps, setPendingApps] = useState<Application[]>([])
+  const [totalApplications, setTotalApplications] = useState(0)
   const [schemes, setSchemes] = useState<Scheme[]>([])
   const [loading, setLoading] = useState(true)
   const [selectedTab, setSelectedTab] = useState('edit-requests')
@@ -117,21 +121,53 @@ export default function AdminPage() {
     fetchData()
   }, [])
 
+  // GET JSON, waiting out 429 / 503 (Retry-After) a few times before failing
+  const fetchJSON = async (path: string, attempts = 3): Promise<any> => {
+    for (let attempt = 1; ; attempt++) {
+      const r = await authFetch(path)
+      if (r.ok) {
+        return r.json()
+      }
+      if ((r.status !== 429 && r.status !== 503) || attempt >= attempts) {
+        throw new Error(`${path} failed (${r.status})`)
+      }
+      const retryAfter = Number(r.headers.get('Retry-After')) || 1
+      await new Promise((resolve) => setTimeout(resolve, retryAfter * 1000))
+    }
+  }
+
+  // Every pending application, oldest first, one page at a time
+  const fetchPendingApplications = async () => {
+    const pending: Application[] = []
+    let hasMore = true
+    while (hasMore) {
+      const page = await fetchJSON(
+        `/api/admin/applications/enriched?status=submitted&sort=submitted_at&limit=200&skip=${pending.length}`
+      )
+      pending.push(...page.applications)
+      hasMore = page.has_more
+    }
+    return pending
+  }
+
   const fetchData = async () => {
     try {
       setLoading(true)
 
-      const [e, a, s] = await Promise.all([
-        authFetch('/api/admin/edit-requests'),
-        authFetch('/api/admin/applications'),
+      const [edits, pending, total, s] = await Promise.all([
+        fetchJSON('/api/admin/edit-requests'),
+        fetchPendingApplications(),
+        fetchJSON('/api/admin/applications/enriched?limit=1'),
         authFetch('/api/admin/schemes')
       ])
 
-      setEditRequests(await e.json())
-      setApplications(await a.json())
+      setEditRequests(edits)
+      setPendingApps(pending)
+      setTotalApplications(total.total || 0)
       setSchemes(await s.json())
     } catch (err) {
       console.error(err)
+      alert('Failed to load admin data, please refresh')
     } finally {
       setLoading(false)
     }
@@ -229,8 +265,6 @@ export default function AdminPage() {
   }
 
   const pendingRequests = editRequests.filter(r => r.status === 'pending')
-  const pendingApps = applications.filter(a => a.status === 'submitted')
-  const processedApps = applications.filter(a => a.status !== 'submitted')
 
   return (
     <div className="min-h-screen bg-background p-8">
@@ -268,7 +302,7 @@ export default function AdminPage() {
             <CardTitle>Total Users</CardTitle>
             <Users />
           </CardHeader>
-          <CardContent className="text-2xl">{applications.length}</CardContent>
+          <CardContent className="text-2xl">{totalApplications}</CardContent>
         </Card>
       </div>
 
@@ -332,8 +366,9 @@ export default function AdminPage() {
                   <Card key={app.id} className="mt-3">
                     <CardContent className="pt-6">
                       <p>ID: {app.id}</p>
-                      <p>Aadhaar: {app.aadhaar}</p>
-                      <p>Scheme: {app.scheme_id}</p>
+                      <p>Applicant: {app.applicant_name || app.aadhaar}</p>
+                      {app.applicant_state && <p>State: {app.applicant_state}</p>}
+                      <p>Scheme: {app.scheme_name || app.scheme_id}</p>
 
                       <div className="flex gap-2 mt-4">
                         <Button
@@ -7,6 +7,7 @@ import { Badge } from '@/components/ui/badge'
 import { useRouter } from 'next/navigation'
 import { Clock, CheckCircle, XCircle, FileSearch, AlertCircle } from 'lucide-react'
 import Link from 'next/link'
+import { loadSchemeCatalog } from '@/lib/scheme-catalog'
 
 interface Application {
   id: string
@@ -55,8 +56,7 @@ export default function ApplicationsPage() {
       setApplications(appsData)
 
       // Fetch scheme details
-      const schemesResponse = await fetch(`${API}/api/schemes`)
-      const schemesData = await schemesResponse.json()
+      const schemesData = await loadSchemeCatalog(API)
       
       const details: SchemeDetails = {}
       schemesData.forEach((scheme: any) => {
@@ -9,6 +9,7 @@ import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '@
 import { useRouter } from 'next/navigation'
 import { Search, Filter } from 'lucide-react'
 import Link from 'next/link'
+import { loadSchemeCatalog } from '@/lib/scheme-catalog'
 
 interface Scheme {
   id: string
@@ -45,8 +46,7 @@ export default function SchemesPage() {
 
   const fetchSchemes = async () => {
     try {
-      const response = await fetch(`${API}/api/schemes`)
-      const data = await response.json()
+      const data = await loadSchemeCatalog(API)
       setSchemes(data)
       setFilteredSchemes(data)
     } catch (error) {
@@ -1,8 +1,12 @@
 # backend/app.py
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, send_from_directory, Response, stream_with_context
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 from datetime import datetime, timedelta
 from functools import wraps
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+import threading
+import time
 import jwt
 import os
 import uuid
@@ -21,9 +25,43 @@ from db import (
     users_collection,
     schemes_collection,
     applications_collection,
-    edit_requests_collection
+    edit_requests_collection,
+    get_pool_stats,
+    mongo
 )
 
+from catalog_sync import (
+    reserved_revisions,
+    reset_catalog_epoch,
+    revision_fields,
+    record_tombstone,
+    get_changes,
+    catalog_cache,
+    DEFAULT_CHANGES_LIMIT,
+    MAX_CHANGES_LIMIT
+)
+
+from load_shedding import LoadShedder, backend_from_env
+
+from bulk_schemes import (
+    import_schemes,
+    export_schemes,
+    create_import_job,
+    get_import_job,
+    list_import_jobs,
+    ImportJobConflict,
+    JOB_ID_PATTERN,
+    FORMATS
+)
+
+from profiling import init_profiling, list_profiles, profile_file
+
+from eligibility_rules import evaluate_criteria, validate_criteria, CriteriaError
+
+from application_views import enriched_applications, QueryError
+
+import warmup
+
 # ------------------------------------------------------------------------------------------------------
 # APP CONFIG
 # ------------------------------------------------------------------------------------------------------
@@ -31,6 +69,13 @@ from db import (
 app = Flask(__name__, static_folder="static", template_folder="templates")
 app.config["SECRET_KEY"] = os.environ.get("SECRET_KEY", "change-this-secret-key-in-production")
 
+# Number of reverse proxies in front of the app (Render adds one). Only the
+# X-Forwarded-For entries those proxies appended are trusted for
+# request.remote_addr; anything further left is client-supplied.
+TRUSTED_PROXY_HOPS = int(os.environ.get("TRUSTED_PROXY_HOPS", 1))
+if TRUSTED_PROXY_HOPS:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS)
+
 VERCEL_ORIGIN = "https://ai-scheme-application-web.vercel.app"
 LOCAL_ORIGIN = "http://localhost:3000"
 
@@ -57,6 +102,61 @@ def decode_token(token):
     return jwt.decode(token, app.config["SECRET_KEY"], algorithms=["HS256"])
 
 
+def request_identity():
+    """Who is calling: token subject, else client IP (never a client-supplied value)"""
+    token = request.headers.get("Authorization", "")
+    if token.startswith("Bearer "):
+        token = token.split(" ", 1)[1]
+    if token:
+        try:
+            data = decode_token(token)
+            subject = data.get("aadhaar") or data.get("user_id")
+            if subject:
+                return subject
+        except Exception:
+            pass
+
+    # remote_addr is resolved by ProxyFix from the trusted proxy hops only
+    return request.remote_addr or "unknown"
+
+
+def login_account():
+    """The aadhaar a login attempt targets, for a per-account bucket on top of the IP one"""
+    body = request.get_json(silent=True) or {}
+    if isinstance(body, dict) and body.get("aadhaar"):
+        return str(body["aadhaar"])
+    return None
+
+
+def is_admin_request():
+    token = request.headers.get("Authorization", "")
+    if token.startswith("Bearer "):
+        token = token.split(" ", 1)[1]
+    try:
+        return decode_token(token).get("user_id") == ADMIN_CREDENTIALS["user_id"]
+    except Exception:
+        return False
+
+
+# ------------------------------------------------------------------------------------------------------
+# LOAD SHEDDING
+# ------------------------------------------------------------------------------------------------------
+
+load_shedder = LoadShedder(
+    request_identity,
+    backend=backend_from_env(),
+    enabled=os.environ.get("LOAD_SHEDDING_ENABLED", "true").lower() == "true",
+    workers=int(os.environ.get("WEB_CONCURRENCY", 1))
+)
+
+
+# ------------------------------------------------------------------------------------------------------
+# PROFILING (no-op unless PROFILING_ENABLED=true)
+# ------------------------------------------------------------------------------------------------------
+
+init_profiling(app, mongo, is_admin_request)
+
+
 # ------------------------------------------------------------------------------------------------------
 # AUTH DECORATORS
 # ------------------------------------------------------------------------------------------------------
@@ -113,21 +213,6 @@ def admin_required(f):
     return wrapper
 
 
-# ------------------------------------------------------------------------------------------------------
-# AUTO-MIGRATE OLD SCHEMES → GIVE THEM UUID ids
-# ------------------------------------------------------------------------------------------------------
-
-def migrate_scheme_ids():
-    all_schemes = list(schemes_collection.find({}))
-    for s in all_schemes:
-        if "id" not in s or not s["id"]:
-            new_id = str(uuid.uuid4())
-            schemes_collection.update_one({"_id": s["_id"]}, {"$set": {"id": new_id}})
-            print(f"[MIGRATION] Added UUID id={new_id} to scheme {s['_id']}")
-
-migrate_scheme_ids()
-
-
 # ------------------------------------------------------------------------------------------------------
 # ROUTES - GENERAL
 # ------------------------------------------------------------------------------------------------------
@@ -137,6 +222,22 @@ def home():
     return jsonify({"status": "backend running"}), 200
 
 
+@app.route("/healthz", methods=["GET"])
+def healthz():
+    return jsonify({"status": "alive"}), 200
+
+
+@app.route("/readyz", methods=["GET"])
+def readyz():
+    if warmup.is_ready():
+        return jsonify(warmup.status()), 200
+
+    # Outside gunicorn nothing runs the warm-up hook, so the first probe starts
+    # it; after a failed attempt, probes start the retry once its backoff ends
+    warmup.start_in_background(get_ml_checker)
+    return jsonify(warmup.status()), 503
+
+
 # ------------------------------------------------------------------------------------------------------
 # USER AUTH
 # ------------------------------------------------------------------------------------------------------
@@ -149,7 +250,7 @@ def register():
     if not aadhaar:
         return jsonify({"message": "Aadhaar required"}), 400
 
-    if users_collection.find_one({"aadhaar": aadhaar}):
+    if users_collection.find_one({"aadhaar": aadhaar}, {"_id": 0, "aadhaar": 1}):
         return jsonify({"message": "User exists"}), 400
 
     user = {
@@ -180,6 +281,7 @@ def register():
 
 
 @app.route("/api/login", methods=["POST"])
+@load_shedder.protect("login", account_fn=login_account)
 def login():
     data = request.get_json() or {}
     aadhaar = data.get("aadhaar")
@@ -220,10 +322,24 @@ def admin_login():
 
 @app.route("/api/schemes", methods=["GET"])
 def all_schemes():
-    schemes = [clean_doc(s) for s in schemes_collection.find({}, {"_id": 0})]
+    schemes = [clean_doc(s) for s in catalog_cache.get()]
     return jsonify(schemes), 200
 
 
+@app.route("/api/schemes/changes", methods=["GET"])
+def scheme_changes():
+    try:
+        since = int(request.args.get("since", 0))
+        limit = int(request.args.get("limit", DEFAULT_CHANGES_LIMIT))
+    except ValueError:
+        return jsonify({"message": "since and limit must be integers"}), 400
+
+    if since < 0 or limit < 1:
+        return jsonify({"message": "since must be >= 0 and limit >= 1"}), 400
+
+    return jsonify(get_changes(since, min(limit, MAX_CHANGES_LIMIT))), 200
+
+
 @app.route("/api/schemes/<sid>", methods=["GET"])
 def get_scheme(sid):
     # Try UUID id
@@ -247,50 +363,100 @@ def get_scheme(sid):
 # ------------------------------------------------------------------------------------------------------
 
 def check_eligibility(user, scheme):
-    c = scheme.get("eligibility_criteria", {})
+    return evaluate_criteria(user, scheme.get("eligibility_criteria", {}))
 
-    u_income = int(user.get("income", 0) or 0)
-    u_age = int(user.get("age", 0) or 0)
-    u_caste = user.get("caste")
-    u_gender = user.get("gender")
 
-    if "max_income" in c and u_income > c["max_income"]:
-        return False, 0.3, "Income exceeds limit"
+# ML scoring runs on a small pool under a per-request time budget. Requests
+# that can't get a slot, or whose score isn't ready in time, use the rules.
+ML_BUDGET_MS = int(os.environ.get("ML_BUDGET_MS", 150))
+ML_MAX_BUDGET_MS = int(os.environ.get("ML_MAX_BUDGET_MS", 1000))
+ML_WORKERS = int(os.environ.get("ML_WORKERS", 2))
 
-    if "min_income" in c and u_income < c["min_income"]:
-        return False, 0.4, "Income below minimum"
+_ml_executor = ThreadPoolExecutor(max_workers=ML_WORKERS, thread_name_prefix="ml-score")
+_ml_slots = threading.BoundedSemaphore(ML_WORKERS * 2)
 
-    if "min_age" in c and u_age < c["min_age"]:
-        return False, 0.5, "Below minimum age"
 
-    if "max_age" in c and u_age > c["max_age"]:
-        return False, 0.5, "Above maximum age"
+def get_ml_checker():
+    """The ML EligibilityChecker, imported and built on first use (TensorFlow is slow to load)"""
+    from ml_eligibility import get_eligibility_checker
+    return get_eligibility_checker()
 
-    if "allowed_caste" in c and u_caste not in c["allowed_caste"]:
-        return False, 0.4, "Caste not eligible"
 
-    if "gender" in c and c["gender"] != u_gender:
-        return False, 0.4, "Gender not eligible"
+def _score_profile(user):
+    try:
+        return get_ml_checker().score_profile(user)
+    finally:
+        _ml_slots.release()
 
-    return True, 0.95, "Eligible"
+
+def ml_score_within_budget(user, budget_ms):
+    """Return ((probability, predictions), status); the score is None unless status is "ok" """
+    if not _ml_slots.acquire(blocking=False):
+        return None, "busy"
+
+    try:
+        future = _ml_executor.submit(_score_profile, user)
+    except RuntimeError:
+        _ml_slots.release()
+        return None, "error"
+
+    try:
+        return future.result(timeout=budget_ms / 1000.0), "ok"
+    except FutureTimeout:
+        return None, "timeout"
+    except Exception as e:
+        print(f"[v0] ML prediction error: {str(e)}")
+        return None, "error"
 
 
 @app.route("/api/schemes/eligible", methods=["POST"])
+@load_shedder.protect("eligible")
 @token_required
 def eligible(user):
-    all_s = list(schemes_collection.find({}, {"_id": 0}))
+    mode = request.args.get("mode", "rules").lower()
+    if mode not in ("rules", "ml"):
+        return jsonify({"message": "mode must be rules or ml"}), 400
+
+    try:
+        budget_ms = min(int(request.args.get("budget_ms", ML_BUDGET_MS)), ML_MAX_BUDGET_MS)
+    except ValueError:
+        return jsonify({"message": "budget_ms must be an integer"}), 400
+
+    started = time.perf_counter()
+    all_s = catalog_cache.get()
     eligible_list = []
 
     for s in all_s:
         ok, conf, reason = check_eligibility(user, s)
         if ok:
-            eligible_list.append({**s, "eligibility_confidence": conf, "eligibility_reason": reason})
+            eligible_list.append({**s, "eligibility_confidence": conf, "eligibility_reason": reason,
+                                  "eligibility_source": "rules"})
 
-    return jsonify({
+    response = {
         "total_schemes": len(all_s),
         "eligible_count": len(eligible_list),
-        "eligible_schemes": eligible_list
-    }), 200
+        "eligible_schemes": eligible_list,
+        "mode": mode
+    }
+
+    if mode == "ml" and eligible_list:
+        # Only schemes that passed the rules are scored. The model features
+        # depend on the user alone, so one score covers every scheme.
+        remaining_ms = budget_ms - (time.perf_counter() - started) * 1000
+        score, ml_status = (None, "timeout") if remaining_ms <= 0 else ml_score_within_budget(user, remaining_ms)
+
+        if score is not None:
+            checker = get_ml_checker()
+            probability, predictions = score
+            for entry in eligible_list:
+                ml_ok, conf, reason = checker.explain(user, entry, probability, predictions)
+                entry.update({"eligibility_confidence": conf, "eligibility_reason": reason,
+                              "eligibility_source": "ml", "ml_eligible": bool(ml_ok)})
+
+        response["ml_status"] = ml_status
+        response["ml_scored_count"] = len(eligible_list) if score is not None else 0
+
+    return jsonify(response), 200
 
 
 # ------------------------------------------------------------------------------------------------------
@@ -316,7 +482,8 @@ def submit_application(user):
 @app.route("/api/applications", methods=["GET"])
 @token_required
 def user_applications(user):
-    apps = [clean_doc(a) for a in applications_collection.find({"aadhaar": user["aadhaar"]}, {"_id": 0})]
+    cursor = applications_collection.find({"aadhaar": user["aadhaar"]}, {"_id": 0}).sort("submitted_at", -1)
+    apps = [clean_doc(a) for a in cursor]
     return jsonify(apps), 200
 
 
@@ -329,17 +496,25 @@ def user_applications(user):
 def admin_create_scheme(admin):
     data = request.get_json() or {}
 
+    try:
+        criteria = validate_criteria(data.get("eligibility_criteria") or {})
+    except CriteriaError as e:
+        return jsonify({"message": str(e)}), 400
+
     scheme = {
         "id": str(uuid.uuid4()),
         "name": data.get("name"),
         "description": data.get("description"),
         "category": data.get("category"),
         "benefits": data.get("benefits"),
-        "eligibility_criteria": data.get("eligibility_criteria", {}),
-        "documents_required": data.get("documents_required", [])
+        "eligibility_criteria": criteria,
+        "documents_required": data.get("documents_required", []),
     }
 
-    schemes_collection.insert_one(scheme)
+    with reserved_revisions() as revision:
+        scheme.update(revision_fields(revision))
+        schemes_collection.insert_one(scheme)
+    catalog_cache.invalidate()
     return jsonify({"message": "Scheme created", "scheme": clean_doc(scheme)}), 201
 
 
@@ -348,40 +523,176 @@ def admin_create_scheme(admin):
 def admin_update_scheme(admin, sid):
     data = request.get_json() or {}
 
+    try:
+        criteria = validate_criteria(data.get("eligibility_criteria") or {})
+    except CriteriaError as e:
+        return jsonify({"message": str(e)}), 400
+
     update = {
         "name": data.get("name"),
         "description": data.get("description"),
         "category": data.get("category"),
         "benefits": data.get("benefits"),
-        "eligibility_criteria": data.get("eligibility_criteria", {}),
-        "documents_required": data.get("documents_required", [])
+        "eligibility_criteria": criteria,
+        "documents_required": data.get("documents_required", []),
     }
 
-    schemes_collection.update_one({"id": sid}, {"$set": update})
+    with reserved_revisions() as revision:
+        update.update(revision_fields(revision))
+        schemes_collection.update_one({"id": sid}, {"$set": update})
+    catalog_cache.invalidate()
     return jsonify({"message": "Scheme updated"}), 200
 
 
 @app.route("/api/admin/schemes/<sid>", methods=["DELETE"])
 @admin_required
 def admin_delete_scheme(admin, sid):
-    schemes_collection.delete_one({"id": sid})
+    result = schemes_collection.delete_one({"id": sid})
+    if result.deleted_count:
+        record_tombstone(sid)
+        catalog_cache.invalidate()
     return jsonify({"message": "Scheme deleted"}), 200
 
 
+@app.route("/api/admin/schemes/resync", methods=["POST"])
+@admin_required
+def admin_resync_schemes(admin):
+    """Make every client drop its cached catalog and download it again"""
+    epoch = reset_catalog_epoch()
+    catalog_cache.invalidate()
+    return jsonify({"message": "Catalog epoch reset", "epoch": epoch}), 200
+
+
+@app.route("/api/admin/schemes/import", methods=["POST"])
+@admin_required
+def admin_import_schemes(admin):
+    fmt = request.args.get("format", "ndjson").lower()
+    if fmt not in FORMATS:
+        return jsonify({"message": f"format must be one of {', '.join(FORMATS)}"}), 400
+
+    job_id = request.args.get("job_id")
+    if job_id and not JOB_ID_PATTERN.fullmatch(job_id):
+        return jsonify({"message": "job_id must be 8-64 letters, digits, '-' or '_'"}), 400
+
+    try:
+        job = import_schemes(request.stream, fmt, job_id=job_id, admin_id=admin["user_id"])
+    except ImportJobConflict as e:
+        return jsonify({"message": str(e)}), 409
+    finally:
+        # A run that was taken over may still have written some chunks
+        catalog_cache.invalidate()
+    status = 200 if job["status"] == "completed" else 500
+    return jsonify(job), status
+
+
+@app.route("/api/admin/schemes/import", methods=["GET"])
+@admin_required
+def admin_import_jobs(admin):
+    try:
+        limit = min(int(request.args.get("limit", 50)), 200)
+    except ValueError:
+        return jsonify({"message": "limit must be an integer"}), 400
+    return jsonify({"jobs": list_import_jobs(max(limit, 1))}), 200
+
+
+@app.route("/api/admin/schemes/import/jobs", methods=["POST"])
+@admin_required
+def admin_create_import_job(admin):
+    """Create a job before uploading, so its progress can be polled during the upload"""
+    data = request.get_json(silent=True) or {}
+    fmt = str(data.get("format", "ndjson")).lower()
+    if fmt not in FORMATS:
+        return jsonify({"message": f"format must be one of {', '.join(FORMATS)}"}), 400
+
+    job_id = data.get("job_id")
+    if job_id is not None and not (isinstance(job_id, str) and JOB_ID_PATTERN.fullmatch(job_id)):
+        return jsonify({"message": "job_id must be 8-64 letters, digits, '-' or '_'"}), 400
+
+    try:
+        job = create_import_job(fmt, job_id=job_id, admin_id=admin["user_id"])
+    except ImportJobConflict as e:
+        return jsonify({"message": str(e)}), 409
+    return jsonify(job), 201
+
+
+@app.route("/api/admin/schemes/import/<job_id>", methods=["GET"])
+@admin_required
+def admin_import_status(admin, job_id):
+    job = get_import_job(job_id)
+    if not job:
+        return jsonify({"message": "Import job not found"}), 404
+    return jsonify(job), 200
+
+
+@app.route("/api/admin/schemes/export", methods=["GET"])
+@admin_required
+def admin_export_schemes(admin):
+    fmt = request.args.get("format", "ndjson").lower()
+    if fmt not in FORMATS:
+        return jsonify({"message": f"format must be one of {', '.join(FORMATS)}"}), 400
+
+    return Response(
+        stream_with_context(export_schemes(fmt)),
+        mimetype=FORMATS[fmt],
+        headers={"Content-Disposition": f"attachment; filename=schemes.{fmt}"}
+    )
+
+
 @app.route("/api/admin/applications", methods=["GET"])
+@load_shedder.protect("admin_list")
 @admin_required
 def admin_all_applications(admin):
-    apps = [clean_doc(a) for a in applications_collection.find({}, {"_id": 0})]
+    cursor = applications_collection.find({}, {"_id": 0}).sort("submitted_at", -1)
+    apps = [clean_doc(a) for a in cursor]
     return jsonify(apps), 200
 
 
+@app.route("/api/admin/applications/enriched", methods=["GET"])
+@load_shedder.protect("admin_list")
+@admin_required
+def admin_enriched_applications(admin):
+    try:
+        return jsonify(enriched_applications(request.args)), 200
+    except QueryError as e:
+        return jsonify({"message": str(e)}), 400
+
+
 @app.route("/api/admin/edit-requests", methods=["GET"])
+@load_shedder.protect("admin_list")
 @admin_required
 def admin_all_requests(admin):
     req = [clean_doc(r) for r in edit_requests_collection.find({}, {"_id": 0})]
     return jsonify(req), 200
 
 
+@app.route("/api/admin/db/pool-stats", methods=["GET"])
+@admin_required
+def admin_pool_stats(admin):
+    return jsonify(get_pool_stats()), 200
+
+
+@app.route("/api/admin/load-shedding", methods=["GET"])
+@admin_required
+def admin_load_shedding_stats(admin):
+    return jsonify(load_shedder.stats()), 200
+
+
+@app.route("/api/admin/profiles", methods=["GET"])
+@admin_required
+def admin_list_profiles(admin):
+    return jsonify(list_profiles()), 200
+
+
+@app.route("/api/admin/profiles/<profile_id>", methods=["GET"])
+@admin_required
+def admin_download_profile(admin, profile_id):
+    found = profile_file(profile_id, request.args.get("kind", "folded"))
+    if not found:
+        return jsonify({"message": "Profile not found"}), 404
+    directory, filename = found
+    return send_from_directory(directory, filename, as_attachment=True)
+
+
 # ------------------------------------------------------------------------------------------------------
 # STATIC FALLBACK
 # ------------------------------------------------------------------------------------------------------
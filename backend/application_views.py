@@ -0,0 +1,149 @@
+# backend/application_views.py
+"""
+Admin view of applications joined with scheme and applicant details.
+
+One aggregation replaces the per-row scheme / user lookups the admin UI
+used to make. Filters on status, scheme and submission date are applied
+first and served by the applications indexes (see indexes.py). The
+applicant's state lives on the user, so a state filter is first resolved to
+that state's aadhaars through the users state index and then applied as an
+`aadhaar` $in filter. The page is always cut before the joins, so only the
+rows returned are looked up.
+"""
+from datetime import datetime, timedelta, timezone
+
+from db import applications_collection, users_collection
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Sort keys the applications indexes can serve without an in-memory sort
+SORTS = {
+    "-submitted_at": [("submitted_at", -1)],
+    "submitted_at": [("submitted_at", 1)],
+}
+
+SCHEME_FIELDS = {"_id": 0, "name": 1, "category": 1}
+USER_FIELDS = {"_id": 0, "name": 1, "state": 1, "district": 1}
+
+
+class QueryError(ValueError):
+    pass
+
+
+def _parse_date(value, name, end=False):
+    try:
+        # fromisoformat only accepts a trailing "Z" from Python 3.11
+        parsed = datetime.fromisoformat(value[:-1] + "+00:00" if value.endswith("Z") else value)
+    except ValueError:
+        raise QueryError(f"{name} must be an ISO date or datetime")
+    # submitted_at is stored as naive UTC, so compare in the same terms
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    # A bare date as the upper bound covers that whole day
+    if end and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed.isoformat()
+
+
+def parse_filters(args):
+    """Build (match, sort, skip, limit, state) from request query args"""
+    match = {}
+    if args.get("status"):
+        match["status"] = args["status"]
+    if args.get("scheme_id"):
+        match["scheme_id"] = args["scheme_id"]
+
+    submitted = {}
+    if args.get("from"):
+        submitted["$gte"] = _parse_date(args["from"], "from")
+    if args.get("to"):
+        submitted["$lt" if len(args["to"]) == 10 else "$lte"] = _parse_date(args["to"], "to", end=True)
+    if submitted:
+        match["submitted_at"] = submitted
+
+    sort_key = args.get("sort", "-submitted_at")
+    if sort_key not in SORTS:
+        raise QueryError(f"sort must be one of {', '.join(SORTS)}")
+
+    try:
+        limit = min(int(args.get("limit", DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+        skip = int(args.get("skip", 0))
+    except ValueError:
+        raise QueryError("limit and skip must be integers")
+    if limit < 1 or skip < 0:
+        raise QueryError("limit must be >= 1 and skip >= 0")
+
+    return match, SORTS[sort_key], skip, limit, args.get("state")
+
+
+def state_filter(state):
+    """Filter on applications.aadhaar matching the applicants from `state`"""
+    # Covered by the users state_1_aadhaar_1 index
+    aadhaars = [u["aadhaar"] for u in users_collection.find({"state": state}, {"_id": 0, "aadhaar": 1})]
+    return {"aadhaar": {"$in": aadhaars}}
+
+
+def build_pipeline(match, sort, skip, limit):
+    """Aggregation returning up to limit + 1 rows, so the caller can tell if there is another page"""
+    return [
+        {"$match": match},
+        {"$sort": dict(sort)},
+        {"$skip": skip},
+        {"$limit": limit + 1},
+        {"$lookup": {
+            "from": "users",
+            "localField": "aadhaar",
+            "foreignField": "aadhaar",
+            "pipeline": [{"$project": USER_FIELDS}, {"$limit": 1}],
+            "as": "applicant"
+        }},
+        {"$unwind": {"path": "$applicant", "preserveNullAndEmptyArrays": True}},
+        {"$lookup": {
+            "from": "schemes",
+            "localField": "scheme_id",
+            "foreignField": "id",
+            "pipeline": [{"$project": SCHEME_FIELDS}, {"$limit": 1}],
+            "as": "scheme"
+        }},
+        {"$unwind": {"path": "$scheme", "preserveNullAndEmptyArrays": True}},
+        {"$project": {
+            "_id": 0,
+            "id": 1,
+            "aadhaar": 1,
+            "scheme_id": 1,
+            "status": 1,
+            "submitted_at": 1,
+            "updated_at": 1,
+            "admin_remarks": 1,
+            "scheme_name": "$scheme.name",
+            "scheme_category": "$scheme.category",
+            "applicant_name": "$applicant.name",
+            "applicant_state": "$applicant.state",
+            "applicant_district": "$applicant.district",
+        }},
+    ]
+
+
+def enriched_applications(args):
+    match, sort, skip, limit, state = parse_filters(args)
+    if state:
+        match.update(state_filter(state))
+    rows = list(applications_collection.aggregate(build_pipeline(match, sort, skip, limit)))
+
+    return {
+        "applications": rows[:limit],
+        "has_more": len(rows) > limit,
+        "skip": skip,
+        "limit": limit,
+        "total": _count(match),
+    }
+
+
+def _count(match):
+    # An empty filter would make count_documents scan every document; the
+    # collection metadata count is exact enough for the admin total
+    if not match:
+        return applications_collection.estimated_document_count()
+    # Filters on status / scheme_id / aadhaar / submitted_at are served by the applications indexes
+    return applications_collection.count_documents(match)
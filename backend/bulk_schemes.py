@@ -0,0 +1,335 @@
+# backend/bulk_schemes.py
+"""
+Streaming bulk import / export of the scheme catalog (NDJSON or CSV).
+
+Import reads the request body row by row, validates each row, and upserts
+valid rows by `id` in chunked unordered bulk writes. Progress is kept in
+`scheme_import_jobs`. The client names the job up front, either by
+creating it (create_import_job) or by passing its own job id with the
+upload, so it can poll progress while the upload runs. After a failure the
+same file can be uploaded again with the job id, and rows committed by
+earlier chunks are skipped. A running import touches its job every
+HEARTBEAT_SECONDS while reading rows; a running job that has not been
+touched for STALE_JOB_SECONDS (its worker died) is treated as failed and can
+be resumed. Each run owns its job through a `run_id` claim token, so a run
+whose job was taken over stops instead of overwriting the new run's state.
+
+Export streams straight from a batched cursor, so neither side ever holds
+the whole catalog in memory.
+"""
+from datetime import datetime, timedelta
+from pymongo import UpdateOne, DESCENDING
+from pymongo.errors import DuplicateKeyError
+import csv
+import io
+import json
+import os
+import re
+import time
+import uuid
+
+from db import schemes_collection, scheme_import_jobs_collection
+from catalog_sync import reserved_revisions, revision_fields, clear_tombstones
+from eligibility_rules import validate_criteria, CriteriaError
+
+CHUNK_SIZE = 500
+MAX_RECORDED_ERRORS = 100
+STALE_JOB_SECONDS = int(os.environ.get("IMPORT_STALE_JOB_SECONDS", 300))
+# How often a running import touches its job while reading rows
+HEARTBEAT_SECONDS = 30
+
+# Client-chosen job ids (e.g. a UUID); use with fullmatch
+JOB_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{8,64}")
+
+SCHEME_FIELDS = [
+    "id",
+    "name",
+    "description",
+    "category",
+    "benefits",
+    "eligibility_criteria",
+    "documents_required",
+]
+
+# Fields stored as JSON inside a single CSV cell
+JSON_FIELDS = ("eligibility_criteria", "documents_required")
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+# Ids for rows that don't carry one are derived from the job and row number,
+# so re-running a failed chunk updates the same schemes instead of duplicating them
+_IMPORT_NAMESPACE = uuid.UUID("6f1c9a52-4d0e-4b8a-9a65-2f3e7c1d8b40")
+
+
+class RowError(ValueError):
+    pass
+
+
+class ImportJobConflict(ValueError):
+    """The job is already running, or the id is taken"""
+
+
+class ImportJobSuperseded(ImportJobConflict):
+    """This run's job was expired as stale and claimed by another upload"""
+
+
+# ------------------------------------------------------------------------------------------------------
+# VALIDATION
+# ------------------------------------------------------------------------------------------------------
+
+def normalize_row(row, fmt):
+    """Turn a parsed NDJSON object or CSV dict into a scheme document"""
+    if not isinstance(row, dict):
+        raise RowError("row must be an object")
+
+    if fmt == "csv":
+        row = dict(row)
+        for field in JSON_FIELDS:
+            value = row.get(field)
+            if value in (None, ""):
+                row.pop(field, None)
+                continue
+            try:
+                row[field] = json.loads(value)
+            except ValueError:
+                if field == "documents_required":
+                    row[field] = [d.strip() for d in value.split(";") if d.strip()]
+                else:
+                    raise RowError(f"{field} is not valid JSON")
+
+    if not row.get("name"):
+        raise RowError("name is required")
+
+    scheme = {field: row.get(field) for field in SCHEME_FIELDS if field != "id"}
+    try:
+        scheme["eligibility_criteria"] = validate_criteria(row.get("eligibility_criteria") or {})
+    except CriteriaError as e:
+        raise RowError(str(e))
+    scheme["documents_required"] = row.get("documents_required") or []
+    if not isinstance(scheme["documents_required"], list):
+        raise RowError("documents_required must be a list")
+
+    if row.get("id"):
+        scheme["id"] = str(row["id"])
+    return scheme
+
+
+# ------------------------------------------------------------------------------------------------------
+# IMPORT
+# ------------------------------------------------------------------------------------------------------
+
+def _read_rows(stream, fmt):
+    """Yield (row_number, parsed row or RowError) from a binary request stream"""
+    text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+
+    if fmt == "csv":
+        for number, row in enumerate(csv.DictReader(text), start=1):
+            yield number, row
+        return
+
+    number = 0
+    for line in text:
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            yield number, json.loads(line)
+        except ValueError:
+            yield number, RowError("invalid JSON")
+
+
+# ------------------------------------------------------------------------------------------------------
+# JOBS
+# ------------------------------------------------------------------------------------------------------
+
+def _expire_if_stale(job):
+    """Mark a running job whose worker stopped updating it as failed"""
+    if job is None or job["status"] != "running":
+        return job
+    cutoff = (datetime.utcnow() - timedelta(seconds=STALE_JOB_SECONDS)).isoformat()
+    if job.get("updated_at", job["started_at"]) >= cutoff:
+        return job
+
+    fields = {"status": "failed", "error": f"no progress for {STALE_JOB_SECONDS}s; upload again to resume"}
+    # Only if nothing touched the job since it was read
+    scheme_import_jobs_collection.update_one(
+        {"job_id": job["job_id"], "status": "running", "updated_at": job.get("updated_at")},
+        {"$set": fields}
+    )
+    return {**job, **fields}
+
+
+def get_import_job(job_id):
+    return _expire_if_stale(scheme_import_jobs_collection.find_one({"job_id": job_id}, {"_id": 0}))
+
+
+def list_import_jobs(limit=50):
+    """Most recently started jobs first, without their error lists"""
+    cursor = (scheme_import_jobs_collection.find({}, {"_id": 0, "errors": 0})
+              .sort("started_at", DESCENDING).limit(limit))
+    return [_expire_if_stale(job) for job in cursor]
+
+
+def create_import_job(fmt, job_id=None, admin_id=None, run_id=None):
+    """
+    Insert a new job; raises ImportJobConflict if `job_id` is taken. With a
+    `run_id` the job starts out running, claimed by that run.
+    """
+    now = datetime.utcnow().isoformat()
+    job = {
+        "job_id": job_id or str(uuid.uuid4()),
+        "format": fmt,
+        "status": "running" if run_id else "created",
+        "run_id": run_id,
+        "created_by": admin_id,
+        "rows_read": 0,
+        "committed_rows": 0,
+        "imported": 0,
+        "rejected": 0,
+        "errors": [],
+        "started_at": now,
+        "updated_at": now,
+    }
+    try:
+        scheme_import_jobs_collection.insert_one(dict(job))
+    except DuplicateKeyError:
+        raise ImportJobConflict(f"import job {job['job_id']} already exists")
+    return job
+
+
+def _claim_job(job_id, run_id):
+    """Move an existing, not running job to running under `run_id`; raises ImportJobConflict if it is running"""
+    result = scheme_import_jobs_collection.update_one(
+        {"job_id": job_id, "status": {"$ne": "running"}},
+        {"$set": {"status": "running", "run_id": run_id, "updated_at": datetime.utcnow().isoformat()},
+         "$unset": {"error": ""}}
+    )
+    if not result.modified_count:
+        raise ImportJobConflict(f"import job {job_id} is already running")
+
+
+def _update_job(job_id, run_id, **fields):
+    """Update the job while `run_id` still owns it; raises ImportJobSuperseded otherwise"""
+    fields["updated_at"] = datetime.utcnow().isoformat()
+    result = scheme_import_jobs_collection.update_one(
+        {"job_id": job_id, "run_id": run_id, "status": "running"},
+        {"$set": fields}
+    )
+    if not result.matched_count:
+        raise ImportJobSuperseded(f"import job {job_id} was taken over by another upload")
+
+
+def _flush(chunk):
+    """Upsert one chunk; stamps each scheme with a fresh catalog revision"""
+    with reserved_revisions(len(chunk)) as first_revision:
+        ops = []
+        for offset, scheme in enumerate(chunk):
+            scheme.update(revision_fields(first_revision + offset))
+            ops.append(UpdateOne({"id": scheme["id"]}, {"$set": scheme}, upsert=True))
+
+        schemes_collection.bulk_write(ops, ordered=False)
+        clear_tombstones([s["id"] for s in chunk])
+
+
+def import_schemes(stream, fmt, job_id=None, admin_id=None):
+    """
+    Import schemes from `stream`. Returns the job document.
+
+    An unknown `job_id` starts a new job under that id. Passing the id of a
+    created or failed job runs or resumes it: rows up to the job's
+    `committed_rows` are skipped. Raises ImportJobConflict if the job is
+    already running, or stops being owned by this run.
+    """
+    run_id = str(uuid.uuid4())
+    job = get_import_job(job_id) if job_id else None
+    if job is None:
+        job = create_import_job(fmt, job_id=job_id, admin_id=admin_id, run_id=run_id)
+    else:
+        _claim_job(job["job_id"], run_id)
+
+    chunk = []
+    last_row = job["committed_rows"]
+    imported, rejected, errors = job["imported"], job["rejected"], list(job["errors"])
+    touched_at = time.monotonic()
+
+    def commit(upto):
+        nonlocal chunk, imported, touched_at
+        if chunk:
+            # Don't write schemes for a job another upload has taken over
+            _update_job(job["job_id"], run_id)
+            _flush(chunk)
+            imported += len(chunk)
+            chunk = []
+        _update_job(job["job_id"], run_id, rows_read=upto, committed_rows=upto,
+                    imported=imported, rejected=rejected, errors=errors)
+        touched_at = time.monotonic()
+        print(f"[IMPORT] {job['job_id']}: {upto} rows read, {imported} imported, {rejected} rejected")
+
+    try:
+        for number, row in _read_rows(stream, fmt):
+            # A slow upload between chunk commits must not look stale
+            if time.monotonic() - touched_at > HEARTBEAT_SECONDS:
+                _update_job(job["job_id"], run_id, rows_read=number)
+                touched_at = time.monotonic()
+
+            if number <= job["committed_rows"]:
+                continue
+            last_row = number
+
+            try:
+                if isinstance(row, RowError):
+                    raise row
+                scheme = normalize_row(row, fmt)
+            except RowError as e:
+                rejected += 1
+                if len(errors) < MAX_RECORDED_ERRORS:
+                    errors.append({"row": number, "error": str(e)})
+            else:
+                scheme.setdefault("id", str(uuid.uuid5(_IMPORT_NAMESPACE, f"{job['job_id']}:{number}")))
+                chunk.append(scheme)
+
+            if number % CHUNK_SIZE == 0:
+                commit(number)
+
+        commit(last_row)
+        _update_job(job["job_id"], run_id, status="completed", completed_at=datetime.utcnow().isoformat())
+    except ImportJobSuperseded:
+        print(f"[IMPORT] {job['job_id']} run {run_id} stopped after row {last_row}: job taken over")
+        raise
+    except Exception as e:
+        try:
+            _update_job(job["job_id"], run_id, status="failed", error=str(e))
+        except ImportJobSuperseded:
+            pass
+        print(f"[IMPORT] {job['job_id']} failed after row {last_row}: {str(e)}")
+
+    return get_import_job(job["job_id"])
+
+
+# ------------------------------------------------------------------------------------------------------
+# EXPORT
+# ------------------------------------------------------------------------------------------------------
+
+def export_schemes(fmt):
+    """Generator of export chunks (str) for every scheme, one row per scheme"""
+    projection = {"_id": 0, **{field: 1 for field in SCHEME_FIELDS}}
+    cursor = schemes_collection.find({}, projection).batch_size(CHUNK_SIZE)
+
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=SCHEME_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        for scheme in cursor:
+            for field in JSON_FIELDS:
+                scheme[field] = json.dumps(scheme.get(field) or ({} if field == "eligibility_criteria" else []))
+            writer.writerow(scheme)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        return
+
+    for scheme in cursor:
+        yield json.dumps(scheme) + "\n"
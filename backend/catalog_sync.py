@@ -0,0 +1,284 @@
+# backend/catalog_sync.py
+"""
+Revision tracking for the scheme catalog.
+
+Every scheme write takes the next value of a global revision counter and
+stores it on the scheme. Deletes leave a tombstone carrying their own
+revision, so clients holding revision N can ask for everything after N
+instead of downloading the whole catalog again.
+
+A revision is taken before the write that carries it commits, so revisions
+can become visible out of order. Each allocation is recorded as pending on
+the counter document until the writer releases it, and the changes feed
+only serves revisions below the lowest pending one (the watermark); a client
+can never move past a revision that has not landed yet.
+"""
+from contextlib import contextmanager
+from datetime import datetime
+from pymongo import ReturnDocument
+import os
+import threading
+import time
+import uuid
+
+from db import mongo, schemes_collection, counters_collection, scheme_tombstones_collection
+
+SCHEME_REVISION_COUNTER = "scheme_revision"
+DEFAULT_CHANGES_LIMIT = 500
+MAX_CHANGES_LIMIT = 2000
+
+# A writer that died without releasing its revisions stops holding the
+# watermark back after this long
+RESERVATION_TIMEOUT_SECONDS = float(os.environ.get("REVISION_RESERVATION_TIMEOUT_SECONDS", 120))
+
+
+def allocate_revisions(count=1):
+    """
+    Reserve `count` consecutive revisions and return the first one. The
+    reservation stays pending until release_revisions() is called with it;
+    use reserved_revisions() rather than calling this directly.
+    """
+    now = time.time()
+    counter = counters_collection.find_one_and_update(
+        {"_id": SCHEME_REVISION_COUNTER},
+        [
+            {"$set": {
+                "value": {"$add": [{"$ifNull": ["$value", 0]}, count]},
+                "epoch": {"$ifNull": ["$epoch", str(uuid.uuid4())]},
+            }},
+            {"$set": {"pending": {"$concatArrays": [
+                {"$filter": {
+                    "input": {"$ifNull": ["$pending", []]},
+                    "cond": {"$gte": ["$$this.at", now - RESERVATION_TIMEOUT_SECONDS]}
+                }},
+                [{"first": {"$subtract": ["$value", count - 1]}, "at": now}],
+            ]}}},
+        ],
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return counter["value"] - count + 1
+
+
+def release_revisions(first):
+    """Mark the reservation starting at `first` as committed"""
+    counters_collection.update_one(
+        {"_id": SCHEME_REVISION_COUNTER},
+        {"$pull": {"pending": {"first": first}}}
+    )
+
+
+@contextmanager
+def reserved_revisions(count=1):
+    """
+    Reserve `count` revisions for the writes in the `with` block:
+
+        with reserved_revisions() as revision:
+            schemes_collection.update_one(..., {"$set": revision_fields(revision)})
+    """
+    first = allocate_revisions(count)
+    try:
+        yield first
+    finally:
+        release_revisions(first)
+
+
+def _watermark(counter):
+    """Highest revision below every live reservation"""
+    if not counter:
+        return 0
+    cutoff = time.time() - RESERVATION_TIMEOUT_SECONDS
+    pending = [r["first"] for r in counter.get("pending", []) if r["at"] >= cutoff]
+    return min(pending) - 1 if pending else counter["value"]
+
+
+def _read_counter(session=None):
+    return counters_collection.find_one({"_id": SCHEME_REVISION_COUNTER}, session=session)
+
+
+def stable_revision(session=None):
+    """Highest revision whose writes, and all writes before it, have committed"""
+    return _watermark(_read_counter(session))
+
+
+def catalog_session():
+    """
+    Causally consistent session for reading the counter and then the catalog.
+    The counter is read from the primary; catalog reads routed to a secondary
+    in the same session wait until that secondary has caught up with it.
+    """
+    return mongo.client.start_session(causal_consistency=True)
+
+
+def reset_catalog_epoch():
+    """Start a new catalog epoch; every client drops its cache and resyncs"""
+    epoch = str(uuid.uuid4())
+    counters_collection.update_one(
+        {"_id": SCHEME_REVISION_COUNTER},
+        {"$set": {"epoch": epoch}, "$setOnInsert": {"value": 0}},
+        upsert=True
+    )
+    return epoch
+
+
+def revision_fields(revision):
+    """Fields to $set on a scheme alongside any write that gives it `revision`"""
+    return {"revision": revision, "updated_at": datetime.utcnow().isoformat()}
+
+
+def record_tombstone(scheme_id):
+    with reserved_revisions() as revision:
+        scheme_tombstones_collection.update_one(
+            {"id": scheme_id},
+            {"$set": {"id": scheme_id, "revision": revision,
+                      "deleted_at": datetime.utcnow().isoformat()}},
+            upsert=True
+        )
+    return revision
+
+
+def clear_tombstones(scheme_ids):
+    """Forget deletes for ids that are being written again"""
+    if scheme_ids:
+        scheme_tombstones_collection.delete_many({"id": {"$in": list(scheme_ids)}})
+
+
+def get_changes(since, limit=DEFAULT_CHANGES_LIMIT):
+    """
+    Return schemes written and ids deleted after revision `since`, oldest
+    first, capped at `limit` entries. Clients pass the returned `revision`
+    back as `since` on the next call; `has_more` means another page is ready.
+
+    Every response carries the catalog `epoch`. A client whose cached epoch
+    differs, or that gets `reset: true` (its revision is ahead of this
+    database, e.g. after a restore), must drop its cache and sync from 0.
+    """
+    with catalog_session() as session:
+        counter = _read_counter(session)
+        epoch = counter.get("epoch") if counter else None
+
+        if since > (counter["value"] if counter else 0):
+            return {"revision": 0, "epoch": epoch, "reset": True,
+                    "has_more": True, "schemes": [], "deleted": []}
+
+        watermark = _watermark(counter)
+        window = {"revision": {"$gt": since, "$lte": watermark}}
+
+        changed = [] if watermark <= since else list(
+            schemes_collection.find(window, {"_id": 0}, session=session)
+            .sort("revision", 1).limit(limit + 1)
+        )
+        # A full sync (since=0) has nothing to delete on the client
+        deleted = [] if since == 0 or watermark <= since else list(
+            scheme_tombstones_collection.find(window, {"_id": 0, "id": 1, "revision": 1},
+                                              session=session)
+            .sort("revision", 1).limit(limit + 1)
+        )
+
+    # Merge both streams by revision and cut the page at `limit`
+    entries = sorted(
+        [("upsert", s) for s in changed] + [("delete", t) for t in deleted],
+        key=lambda e: e[1]["revision"]
+    )
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    if entries:
+        revision = entries[-1][1]["revision"]
+    else:
+        revision = since
+
+    return {
+        "revision": revision,
+        "epoch": epoch,
+        "reset": False,
+        "has_more": has_more,
+        "schemes": [doc for op, doc in entries if op == "upsert"],
+        "deleted": [doc["id"] for op, doc in entries if op == "delete"],
+    }
+
+
+def migrate_scheme_ids():
+    """Give schemes created before UUID ids an id"""
+    # Matches both a missing and a null id, so the id_1 index serves it
+    for s in schemes_collection.find({"id": {"$in": [None, ""]}}, {"_id": 1}):
+        new_id = str(uuid.uuid4())
+        schemes_collection.update_one({"_id": s["_id"]}, {"$set": {"id": new_id}})
+        print(f"[MIGRATION] Added UUID id={new_id} to scheme {s['_id']}")
+
+
+def migrate_scheme_revisions():
+    """Give schemes created before revision tracking a revision"""
+    pending = [s["_id"] for s in schemes_collection.find({"revision": {"$exists": False}}, {"_id": 1})]
+    if not pending:
+        return
+
+    with reserved_revisions(len(pending)) as first:
+        for offset, oid in enumerate(pending):
+            schemes_collection.update_one({"_id": oid}, {"$set": revision_fields(first + offset)})
+    print(f"[MIGRATION] Assigned revisions to {len(pending)} scheme(s)")
+
+
+# ------------------------------------------------------------------------------------------------------
+# PROCESS-LOCAL CATALOG CACHE
+# ------------------------------------------------------------------------------------------------------
+
+class CatalogCache:
+    """
+    The full scheme list, reloaded when the catalog's stable revision moves.
+
+    The stable revision (see stable_revision) is checked at most every
+    `check_seconds`. A write still in flight when the cache reloads holds the
+    watermark below its revision, so the watermark moves, and the cache
+    reloads, once it commits. The counter and the schemes are read in one
+    causally consistent session, so a catalog read served by a lagging
+    secondary still sees every write up to the recorded revision. A full
+    reload is also forced every `max_age_seconds` as a backstop.
+    """
+
+    def __init__(self, check_seconds=5, max_age_seconds=60):
+        self.check_seconds = check_seconds
+        self.max_age_seconds = max_age_seconds
+        self._schemes = None
+        self._revision = None
+        self._loaded_at = 0.0
+        self._checked_at = 0.0
+        self._invalidations = 0
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        with self._lock, catalog_session() as session:
+            invalidations = self._invalidations
+            revision = stable_revision(session)
+            schemes = list(schemes_collection.find({}, {"_id": 0}, session=session))
+            self._schemes = schemes
+            self._revision = revision
+            self._checked_at = time.monotonic()
+            # An invalidate() during the read may not be reflected in it
+            if invalidations == self._invalidations:
+                self._loaded_at = self._checked_at
+        return schemes
+
+    def get(self):
+        # One read of the list, so a concurrent refresh or invalidate cannot
+        # change what this call returns
+        schemes = self._schemes
+        now = time.monotonic()
+        if schemes is None or now - self._loaded_at > self.max_age_seconds:
+            return self.refresh()
+        if now - self._checked_at > self.check_seconds:
+            self._checked_at = now
+            if stable_revision() != self._revision:
+                return self.refresh()
+        return schemes
+
+    def invalidate(self):
+        """Force a reload on the next get(); the current list stays servable until then"""
+        self._invalidations += 1
+        self._loaded_at = float("-inf")
+
+
+catalog_cache = CatalogCache(
+    check_seconds=float(os.environ.get("CATALOG_CACHE_CHECK_SECONDS", 5)),
+    max_age_seconds=float(os.environ.get("CATALOG_CACHE_MAX_AGE_SECONDS", 60))
+)
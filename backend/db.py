@@ -1,6 +1,16 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, monitoring
+from pymongo.read_preferences import (
+    Primary,
+    PrimaryPreferred,
+    Secondary,
+    SecondaryPreferred,
+    Nearest,
+)
+from collections import deque
 from datetime import datetime
 import os
+import threading
+import time
 import certifi
 
 # Read MongoDB URI from environment variable (set this in Render)
@@ -12,24 +22,276 @@ if not MONGODB_URI:
 # Database name
 DATABASE_NAME = os.getenv("DB_NAME", "government_schemes_db")
 
-# Initialize MongoDB client with TLS support
-client = MongoClient(MONGODB_URI, tls=True, tlsCAFile=certifi.where())
-db = client[DATABASE_NAME]
+
+def _env_int(name, default=None):
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    return int(value)
+
+
+# Connection pool settings (pymongo defaults apply when unset)
+POOL_OPTIONS = {
+    "maxPoolSize": _env_int("MONGO_MAX_POOL_SIZE", 100),
+    "minPoolSize": _env_int("MONGO_MIN_POOL_SIZE", 0),
+    "maxIdleTimeMS": _env_int("MONGO_MAX_IDLE_TIME_MS"),
+    "waitQueueTimeoutMS": _env_int("MONGO_WAIT_QUEUE_TIMEOUT_MS"),
+    "connectTimeoutMS": _env_int("MONGO_CONNECT_TIMEOUT_MS", 10000),
+    "serverSelectionTimeoutMS": _env_int("MONGO_SERVER_SELECTION_TIMEOUT_MS", 10000),
+    "socketTimeoutMS": _env_int("MONGO_SOCKET_TIMEOUT_MS"),
+}
+
+# Read preference for catalog (scheme) reads, e.g. "secondaryPreferred".
+# Writes always go to the primary regardless of this setting.
+CATALOG_READ_PREFERENCE = os.getenv("MONGO_CATALOG_READ_PREFERENCE", "primary")
+CATALOG_MAX_STALENESS_SECONDS = _env_int("MONGO_CATALOG_MAX_STALENESS_SECONDS", -1)
+
+_READ_PREFERENCES = {
+    "primary": Primary,
+    "primarypreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondarypreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+
+def build_read_preference(name, max_staleness=-1):
+    """Translate a read preference name from the environment into a pymongo object"""
+    cls = _READ_PREFERENCES.get((name or "primary").lower())
+    if cls is None:
+        raise ValueError(f"Unknown read preference: {name}")
+    if cls is Primary:
+        return Primary()
+    return cls(max_staleness=max_staleness)
+
+
+# ------------------------------------------------------------------------------------------------------
+# POOL MONITORING
+# ------------------------------------------------------------------------------------------------------
+
+class PoolWaitListener(monitoring.ConnectionPoolListener):
+    """Records how long requests wait to check a connection out of the pool"""
+
+    def __init__(self, sample_size=1024):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._samples = deque(maxlen=sample_size)
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self.checkouts = 0
+            self.checkout_failures = 0
+            self.total_wait_ms = 0.0
+            self.max_wait_ms = 0.0
+            self.in_use = 0
+            self.open_connections = 0
+            self.pool_clears = 0
+
+    def _started_at(self):
+        if not hasattr(self._local, "started"):
+            self._local.started = {}
+        return self._local.started
+
+    # Checkouts happen synchronously on the requesting thread, so the start
+    # time can be kept thread-locally and matched to the completion event.
+    def connection_check_out_started(self, event):
+        self._started_at()[event.address] = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        started = self._started_at().pop(event.address, None)
+        waited_ms = (time.perf_counter() - started) * 1000 if started else 0.0
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.total_wait_ms += waited_ms
+            self.max_wait_ms = max(self.max_wait_ms, waited_ms)
+            self._samples.append(waited_ms)
+
+    def connection_check_out_failed(self, event):
+        self._started_at().pop(event.address, None)
+        with self._lock:
+            self.checkout_failures += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.in_use = max(0, self.in_use - 1)
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections = max(0, self.open_connections - 1)
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def snapshot(self):
+        with self._lock:
+            samples = sorted(self._samples)
+            checkouts = self.checkouts
+            stats = {
+                "checkouts": checkouts,
+                "checkout_failures": self.checkout_failures,
+                "in_use": self.in_use,
+                "open_connections": self.open_connections,
+                "pool_clears": self.pool_clears,
+                "wait_ms": {
+                    "avg": round(self.total_wait_ms / checkouts, 3) if checkouts else 0.0,
+                    "max": round(self.max_wait_ms, 3),
+                },
+            }
+
+        for label, q in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99)):
+            stats["wait_ms"][label] = round(samples[int(q * (len(samples) - 1))], 3) if samples else 0.0
+        return stats
+
+
+# ------------------------------------------------------------------------------------------------------
+# CONNECTION MANAGER
+# ------------------------------------------------------------------------------------------------------
+
+class MongoConnectionManager:
+    """
+    Owns the MongoClient for the current process.
+
+    The client is created lazily on first use and re-created whenever the
+    process ID changes, so a client opened in gunicorn's master before the
+    fork is never shared with the workers.
+    """
+
+    def __init__(self, uri, database_name, pool_options=None,
+                 catalog_read_preference=None):
+        self.uri = uri
+        self.database_name = database_name
+        self.pool_options = {k: v for k, v in (pool_options or {}).items() if v is not None}
+        self.catalog_read_preference = catalog_read_preference or Primary()
+        self.pool_listener = PoolWaitListener()
+        self._event_listeners = [self.pool_listener]
+        self._lock = threading.Lock()
+        self._client = None
+        self._pid = None
+
+    def _create_client(self):
+        return MongoClient(
+            self.uri,
+            tls=True,
+            tlsCAFile=certifi.where(),
+            event_listeners=list(self._event_listeners),
+            **self.pool_options
+        )
+
+    @property
+    def client(self):
+        pid = os.getpid()
+        if self._client is None or self._pid != pid:
+            with self._lock:
+                if self._client is None or self._pid != pid:
+                    if self._pid is not None and self._pid != pid:
+                        # Forked: the inherited client's sockets belong to the
+                        # parent, so drop it without closing and start fresh.
+                        self.pool_listener.reset()
+                    self._client = self._create_client()
+                    self._pid = pid
+        return self._client
+
+    @property
+    def db(self):
+        return self.client[self.database_name]
+
+    def collection(self, name, catalog=False):
+        coll = self.db[name]
+        if catalog:
+            coll = coll.with_options(read_preference=self.catalog_read_preference)
+        return coll
+
+    def add_event_listener(self, listener):
+        """Register a pymongo event listener; the client is rebuilt on next use"""
+        with self._lock:
+            self._event_listeners.append(listener)
+            if self._client is not None and self._pid == os.getpid():
+                self._client.close()
+            self._client = None
+
+    def pool_stats(self):
+        return {
+            "pid": self._pid,
+            "connected": self._client is not None and self._pid == os.getpid(),
+            "options": dict(self.pool_options),
+            "catalog_read_preference": self.catalog_read_preference.name,
+            **self.pool_listener.snapshot(),
+        }
+
+
+class _CollectionProxy:
+    """Module-level collection handle that resolves against the current process's client"""
+
+    def __init__(self, manager, name, catalog=False):
+        self._manager = manager
+        self._name = name
+        self._catalog = catalog
+
+    def __getattr__(self, attr):
+        return getattr(self._manager.collection(self._name, self._catalog), attr)
+
+    def __repr__(self):
+        return f"<CollectionProxy {self._manager.database_name}.{self._name}>"
+
+
+class _DatabaseProxy:
+    def __init__(self, manager):
+        self._manager = manager
+
+    def __getattr__(self, attr):
+        return getattr(self._manager.db, attr)
+
+    def __getitem__(self, name):
+        return self._manager.db[name]
+
+
+mongo = MongoConnectionManager(
+    MONGODB_URI,
+    DATABASE_NAME,
+    pool_options=POOL_OPTIONS,
+    catalog_read_preference=build_read_preference(
+        CATALOG_READ_PREFERENCE, CATALOG_MAX_STALENESS_SECONDS
+    ),
+)
+db = _DatabaseProxy(mongo)
+
+
+def get_pool_stats():
+    return mongo.pool_stats()
+
 
 # Collections
-users_collection = db['users']
-schemes_collection = db['schemes']
-applications_collection = db['applications']
-edit_requests_collection = db['edit_requests']
-digilocker_sessions_collection = db['digilocker_sessions']
-
-# Create indexes
-users_collection.create_index('aadhaar', unique=True)
-schemes_collection.create_index('id', unique=True)
-applications_collection.create_index('aadhaar')
-applications_collection.create_index('scheme_id')
-edit_requests_collection.create_index('aadhaar')
-digilocker_sessions_collection.create_index('session_id', unique=True)
+users_collection = _CollectionProxy(mongo, 'users')
+schemes_collection = _CollectionProxy(mongo, 'schemes', catalog=True)
+applications_collection = _CollectionProxy(mongo, 'applications')
+edit_requests_collection = _CollectionProxy(mongo, 'edit_requests')
+digilocker_sessions_collection = _CollectionProxy(mongo, 'digilocker_sessions')
+counters_collection = _CollectionProxy(mongo, 'counters')
+scheme_tombstones_collection = _CollectionProxy(mongo, 'scheme_tombstones', catalog=True)
+rate_limits_collection = _CollectionProxy(mongo, 'rate_limits')
+scheme_import_jobs_collection = _CollectionProxy(mongo, 'scheme_import_jobs')
+
+# Indexes are declared in indexes.py and reconciled at deploy time
 
 def init_sample_schemes():
     """Initialize sample schemes if database is empty"""
@@ -37,8 +299,8 @@ def init_sample_schemes():
         sample_schemes = [
             # ... (your sample scheme data stays the same)
         ]
-        schemes_collection.insert_many(sample_schemes)
-        print(f"Initialized {len(sample_schemes)} sample schemes")
+        if sample_schemes:
+            schemes_collection.insert_many(sample_schemes)
+            print(f"Initialized {len(sample_schemes)} sample schemes")
 
-# Initialize sample data
-init_sample_schemes()
+# Sample data is seeded at deploy time (release.py), not on import
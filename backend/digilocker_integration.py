@@ -1,6 +1,6 @@
 import requests
 import json
-from datetime import datetime
+from datetime import datetime, timedelta
 import secrets
 from db import digilocker_sessions_collection
 
@@ -9,7 +9,8 @@ DIGILOCKER_CONFIG = {
     'sandbox_url': 'https://dg-sandbox.setu.co',
     'api_key': 'your-sandbox-api-key',
     'api_secret': 'your-sandbox-api-secret',
-    'redirect_url': 'http://localhost:3000/auth/digilocker/callback'
+    'redirect_url': 'http://localhost:3000/auth/digilocker/callback',
+    'session_ttl_seconds': 3600
 }
 
 def initiate_digilocker_auth():
@@ -25,6 +26,7 @@ def initiate_digilocker_auth():
             'session_id': session_id,
             'status': 'pending',
             'created_at': datetime.now().isoformat(),
+            'expires_at': datetime.utcnow() + timedelta(seconds=DIGILOCKER_CONFIG['session_ttl_seconds']),
             'redirect_url': DIGILOCKER_CONFIG['redirect_url']
         }
         
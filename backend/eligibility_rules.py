@@ -0,0 +1,99 @@
+# backend/eligibility_rules.py
+"""
+Rule-based eligibility, shared by the /api/schemes/eligible route, the ML
+EligibilityChecker and scheme validation.
+
+Supported `eligibility_criteria` keys:
+
+    min_age, max_age, min_income, max_income   numbers
+    allowed_caste                              list of castes
+    gender                                     single gender
+
+`caste` is accepted as a legacy alias of `allowed_caste`. Caste and gender
+are compared case-insensitively. A missing income or age counts as 0; one
+that is present but not a number fails every criterion on that field.
+"""
+
+NUMERIC_CRITERIA = ("min_age", "max_age", "min_income", "max_income")
+CASTE_CRITERIA = ("allowed_caste", "caste")
+
+
+class CriteriaError(ValueError):
+    pass
+
+
+def _as_int(value):
+    """int for a missing (0) or numeric value, None when the value can't be parsed"""
+    try:
+        return int(float(value or 0))
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+def _allowed_castes(criteria):
+    for key in CASTE_CRITERIA:
+        if key in criteria:
+            return [str(c).upper() for c in criteria[key]]
+    return None
+
+
+def evaluate_criteria(user, criteria):
+    """Return (eligible, confidence, reason) for `user` against `criteria`"""
+    criteria = criteria or {}
+
+    u_income = _as_int(user.get("income"))
+    u_age = _as_int(user.get("age"))
+    u_caste = str(user.get("caste") or "").upper()
+    u_gender = str(user.get("gender") or "").lower()
+
+    if u_income is None and ("max_income" in criteria or "min_income" in criteria):
+        return False, 0.3, "Income is not a valid number"
+
+    if u_age is None and ("min_age" in criteria or "max_age" in criteria):
+        return False, 0.3, "Age is not a valid number"
+
+    if "max_income" in criteria and u_income > criteria["max_income"]:
+        return False, 0.3, "Income exceeds limit"
+
+    if "min_income" in criteria and u_income < criteria["min_income"]:
+        return False, 0.4, "Income below minimum"
+
+    if "min_age" in criteria and u_age < criteria["min_age"]:
+        return False, 0.5, "Below minimum age"
+
+    if "max_age" in criteria and u_age > criteria["max_age"]:
+        return False, 0.5, "Above maximum age"
+
+    allowed_castes = _allowed_castes(criteria)
+    if allowed_castes is not None and u_caste not in allowed_castes:
+        return False, 0.4, "Caste not eligible"
+
+    if "gender" in criteria and str(criteria["gender"]).lower() != u_gender:
+        return False, 0.4, "Gender not eligible"
+
+    return True, 0.95, "Eligible"
+
+
+def validate_criteria(criteria):
+    """Raise CriteriaError unless `criteria` can be evaluated by evaluate_criteria"""
+    if not isinstance(criteria, dict):
+        raise CriteriaError("eligibility_criteria must be an object")
+
+    for key in NUMERIC_CRITERIA:
+        if key in criteria and (isinstance(criteria[key], bool) or not isinstance(criteria[key], (int, float))):
+            raise CriteriaError(f"eligibility_criteria.{key} must be a number")
+
+    for key in CASTE_CRITERIA:
+        if key in criteria:
+            value = criteria[key]
+            if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+                raise CriteriaError(f"eligibility_criteria.{key} must be a list of strings")
+
+    if "gender" in criteria and not isinstance(criteria["gender"], str):
+        raise CriteriaError("eligibility_criteria.gender must be a string")
+
+    for low, high in (("min_age", "max_age"), ("min_income", "max_income")):
+        if low in criteria and high in criteria and criteria[low] > criteria[high]:
+            raise CriteriaError(f"eligibility_criteria.{low} is greater than {high}")
+
+    return criteria
@@ -0,0 +1,25 @@
+# backend/gunicorn.conf.py
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+# app.py splits the per-instance load shedding limits across this many workers
+os.environ["WEB_CONCURRENCY"] = str(workers)
+
+# Threaded workers serve several requests at once, so the per-process
+# concurrency limiter in load_shedding.py has something to limit; with sync
+# workers it would never see more than one request in flight
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 8))
+
+# Warm-up (TensorFlow graph tracing, first model calls) runs before a worker
+# serves traffic, so allow it more than gunicorn's default 30s to boot
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120))
+
+
+def post_worker_init(worker):
+    """Warm each worker up before it accepts connections"""
+    from app import get_ml_checker
+    import warmup
+
+    warmup.warm_up(get_ml_checker)
@@ -0,0 +1,118 @@
+# backend/indexes.py
+"""
+Declarative index registry.
+
+Every index the app relies on is listed in INDEXES. reconcile_indexes()
+brings a database in line with the registry and is run at deploy time
+by release.py. It can also be run on its own:
+
+    python indexes.py           # create missing / changed indexes
+    python indexes.py --prune   # also drop indexes not in the registry
+"""
+from pymongo import ASCENDING, DESCENDING, IndexModel
+import sys
+
+INDEXES = {
+    "users": [
+        IndexModel([("aadhaar", ASCENDING)], name="aadhaar_1", unique=True),
+        # Admin applications state filter: state -> aadhaars, index-only
+        IndexModel([("state", ASCENDING), ("aadhaar", ASCENDING)], name="state_1_aadhaar_1"),
+    ],
+    "schemes": [
+        IndexModel([("id", ASCENDING)], name="id_1", unique=True),
+        # Delta sync feed (catalog_sync.get_changes)
+        IndexModel([("revision", ASCENDING)], name="revision_1"),
+    ],
+    "scheme_tombstones": [
+        IndexModel([("id", ASCENDING)], name="id_1", unique=True),
+        IndexModel([("revision", ASCENDING)], name="revision_1"),
+    ],
+    "scheme_import_jobs": [
+        IndexModel([("job_id", ASCENDING)], name="job_id_1", unique=True),
+        # Job listing, newest first
+        IndexModel([("started_at", DESCENDING)], name="started_at_-1"),
+    ],
+    "rate_limits": [
+        # Shared token buckets (load_shedding.MongoRateLimitBackend); idle buckets expire
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "applications": [
+        # User's own applications, newest first
+        IndexModel([("aadhaar", ASCENDING), ("submitted_at", DESCENDING)],
+                   name="aadhaar_1_submitted_at_-1"),
+        # Admin listings: all / by status / by scheme, newest first
+        IndexModel([("submitted_at", DESCENDING)], name="submitted_at_-1"),
+        IndexModel([("status", ASCENDING), ("submitted_at", DESCENDING)],
+                   name="status_1_submitted_at_-1"),
+        IndexModel([("scheme_id", ASCENDING), ("submitted_at", DESCENDING)],
+                   name="scheme_id_1_submitted_at_-1"),
+    ],
+    "edit_requests": [
+        IndexModel([("aadhaar", ASCENDING)], name="aadhaar_1"),
+    ],
+    "digilocker_sessions": [
+        IndexModel([("session_id", ASCENDING)], name="session_id_1", unique=True),
+        # Abandoned consent flows expire; completed sessions are kept
+        IndexModel([("expires_at", ASCENDING)], name="pending_session_ttl",
+                   expireAfterSeconds=0,
+                   partialFilterExpression={"status": "pending"}),
+    ],
+}
+
+# Index options that make two indexes with the same keys different
+_COMPARED_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression")
+
+
+def _spec_signature(spec):
+    # Servers may report key directions as doubles (1.0), so normalise them
+    key = [(k, int(v) if isinstance(v, (int, float)) else v) for k, v in spec["key"].items()]
+    options = {opt: spec[opt] for opt in _COMPARED_OPTIONS if opt in spec}
+    return key, options
+
+
+def reconcile_indexes(database, prune=False, registry=None):
+    """Create, rebuild and (optionally) drop indexes so `database` matches the registry"""
+    registry = INDEXES if registry is None else registry
+    report = {"created": [], "rebuilt": [], "dropped": [], "unchanged": []}
+
+    for coll_name, models in registry.items():
+        coll = database[coll_name]
+        existing = {ix["name"]: ix for ix in coll.list_indexes()}
+        to_create = []
+
+        for model in models:
+            wanted = model.document
+            name = wanted["name"]
+            current = existing.get(name)
+
+            if current is None:
+                to_create.append(model)
+                report["created"].append(f"{coll_name}.{name}")
+            elif _spec_signature(current) != _spec_signature(wanted):
+                coll.drop_index(name)
+                to_create.append(model)
+                report["rebuilt"].append(f"{coll_name}.{name}")
+            else:
+                report["unchanged"].append(f"{coll_name}.{name}")
+
+        if to_create:
+            coll.create_indexes(to_create)
+
+        if prune:
+            wanted_names = {m.document["name"] for m in models}
+            for name in existing:
+                if name != "_id_" and name not in wanted_names:
+                    coll.drop_index(name)
+                    report["dropped"].append(f"{coll_name}.{name}")
+
+    return report
+
+
+if __name__ == "__main__":
+    from db import db
+
+    result = reconcile_indexes(db, prune="--prune" in sys.argv)
+    for action in ("created", "rebuilt", "dropped"):
+        for name in result[action]:
+            print(f"[INDEXES] {action}: {name}")
+    print(f"[INDEXES] {len(result['unchanged'])} index(es) already up to date")
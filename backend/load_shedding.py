@@ -0,0 +1,299 @@
+# backend/load_shedding.py
+"""
+Protection for expensive endpoints.
+
+Two independent checks run before the view:
+
+* a per-identity token bucket (keyed by the token's aadhaar / admin id, or
+  the client IP), rejected with 429 and Retry-After once the bucket is
+  empty. A view can add a second bucket per targeted account (login uses
+  the aadhaar in the body); it is checked after, never instead of, the
+  caller's own bucket, so rotating the account does not reset the limit;
+* an adaptive concurrency limiter per endpoint group, rejected with 503
+  as soon as the group is at its limit instead of queueing the request.
+
+The concurrency limit follows measured latency in the style of Netflix's
+gradient limiter: while latency stays near its long-run baseline the limit
+grows, when it climbs the limit shrinks, and failures back it off
+multiplicatively.
+
+Policy numbers (rates, bursts, concurrency limits) are per instance, i.e.
+for all gunicorn workers on one host together. Limiter state is per process,
+so each worker gets its share of the instance limit. Token buckets are kept
+in memory by default, also split across workers, or in MongoDB
+(RATE_LIMIT_BACKEND=mongo), where one bucket is shared by every worker of
+every instance and the policy rate applies as-is.
+
+The limiter can only shed load if a worker serves requests concurrently,
+which is why gunicorn.conf.py uses threaded (gthread) workers. A sync worker
+has at most one request in flight and would never reach its limit.
+"""
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from functools import wraps
+import math
+import os
+import threading
+import time
+
+from flask import jsonify
+from pymongo import ReturnDocument
+
+
+# ------------------------------------------------------------------------------------------------------
+# TOKEN BUCKET BACKENDS
+# ------------------------------------------------------------------------------------------------------
+
+class RateLimitBackend:
+    """Interface for token bucket storage"""
+
+    # True when every worker takes tokens from the same buckets
+    shared = False
+
+    def take_token(self, key, rate, burst):
+        """Take one token from `key`'s bucket; return (allowed, retry_after_seconds)"""
+        raise NotImplementedError
+
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    """Per-process buckets, least recently used keys evicted past `max_keys`"""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take_token(self, key, rate, burst):
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - last) * rate)
+
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+
+        retry_after = 0 if allowed else (1 - tokens) / rate
+        return allowed, retry_after
+
+
+class MongoRateLimitBackend(RateLimitBackend):
+    """
+    Buckets shared by every worker, stored one document per key.
+
+    Refill and take happen in a single pipeline update so concurrent
+    workers cannot both spend the last token. Idle buckets are removed by
+    the TTL index on `expires_at`.
+    """
+
+    shared = True
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def take_token(self, key, rate, burst):
+        now = time.time()
+        idle_seconds = burst / rate
+        refilled = {"$min": [burst, {"$add": [
+            {"$ifNull": ["$tokens", burst]},
+            {"$multiply": [{"$subtract": [now, {"$ifNull": ["$ts", now]}]}, rate]}
+        ]}]}
+
+        bucket = self.collection.find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {"tokens": refilled, "ts": now,
+                          "expires_at": datetime.utcnow() + timedelta(seconds=idle_seconds)}},
+                {"$set": {"allowed": {"$gte": ["$tokens", 1]}}},
+                {"$set": {"tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", 1]}, "$tokens"]}}},
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+
+        if bucket["allowed"]:
+            return True, 0
+        return False, (1 - bucket["tokens"]) / rate
+
+
+# ------------------------------------------------------------------------------------------------------
+# ADAPTIVE CONCURRENCY LIMIT
+# ------------------------------------------------------------------------------------------------------
+
+class AdaptiveConcurrencyLimiter:
+    """Gradient-style concurrency limit that tracks request latency"""
+
+    def __init__(self, name, initial_limit=20, min_limit=1, max_limit=200,
+                 tolerance=2.0, smoothing=0.2, backoff=0.9, baseline_window=600):
+        self.name = name
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.backoff = backoff
+        self.baseline_window = baseline_window
+
+        self.in_flight = 0
+        self.baseline_ms = None
+        self.last_latency_ms = None
+        self.accepted = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        with self._lock:
+            if self.in_flight >= int(self.limit):
+                self.rejected += 1
+                return False
+            self.in_flight += 1
+            self.accepted += 1
+            return True
+
+    def release(self, latency_ms, failed=False):
+        with self._lock:
+            in_flight = self.in_flight
+            self.in_flight -= 1
+            self.last_latency_ms = latency_ms
+
+            if failed:
+                # Multiplicative decrease on errors
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                return
+
+            if self.baseline_ms is None:
+                self.baseline_ms = latency_ms
+            else:
+                self.baseline_ms += (latency_ms - self.baseline_ms) / self.baseline_window
+
+            # Only grow when the limit is actually being used
+            if in_flight < self.limit / 2 and latency_ms <= self.baseline_ms * self.tolerance:
+                return
+
+            gradient = max(0.5, min(1.0, self.tolerance * self.baseline_ms / max(latency_ms, 1e-3)))
+            new_limit = self.limit * gradient + math.sqrt(self.limit)
+            self.limit = self.limit * (1 - self.smoothing) + new_limit * self.smoothing
+            self.limit = max(self.min_limit, min(self.max_limit, self.limit))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "limit": round(self.limit, 2),
+                "in_flight": self.in_flight,
+                "baseline_ms": round(self.baseline_ms, 3) if self.baseline_ms is not None else None,
+                "last_latency_ms": round(self.last_latency_ms, 3) if self.last_latency_ms is not None else None,
+                "accepted": self.accepted,
+                "rejected": self.rejected,
+            }
+
+
+# ------------------------------------------------------------------------------------------------------
+# POLICIES + DECORATOR
+# ------------------------------------------------------------------------------------------------------
+
+# Per instance: rate = tokens refilled per second, burst = bucket size,
+# initial_limit / max_limit = concurrent requests
+DEFAULT_POLICIES = {
+    "eligible": {"rate": 1.0, "burst": 5, "initial_limit": 8, "max_limit": 64},
+    "login": {"rate": 0.2, "burst": 5, "initial_limit": 16, "max_limit": 128},
+    # One admin dashboard load is 3 requests plus a page per 200 pending
+    # applications, and every approve / reject reloads it
+    "admin_list": {"rate": 2.0, "burst": 40, "initial_limit": 8, "max_limit": 32},
+}
+
+
+class LoadShedder:
+    def __init__(self, identity_fn, backend=None, policies=None, enabled=True, workers=1):
+        self.identity_fn = identity_fn
+        self.backend = backend or InMemoryRateLimitBackend()
+        self.policies = policies or DEFAULT_POLICIES
+        self.enabled = enabled
+        self.workers = max(1, workers)
+        self.limiters = {
+            name: AdaptiveConcurrencyLimiter(
+                name,
+                initial_limit=self._share(p["initial_limit"]),
+                max_limit=self._share(p["max_limit"])
+            )
+            for name, p in self.policies.items()
+        }
+
+    def _share(self, amount):
+        """This worker's part of a per-instance amount"""
+        return max(1, math.ceil(amount / self.workers))
+
+    def _bucket(self, policy):
+        """(rate, burst) for this worker's token buckets"""
+        if self.backend.shared:
+            return policy["rate"], policy["burst"]
+        return policy["rate"] / self.workers, self._share(policy["burst"])
+
+    def _rejected(self, retry_after):
+        response = jsonify({"message": "Too many requests, slow down"})
+        response.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+        return response, 429
+
+    def protect(self, policy_name, account_fn=None):
+        """
+        Decorator: rate limit and concurrency limit a view under `policy_name`.
+        `account_fn`, if given, returns the account a request targets (or
+        None); each account then also gets its own bucket.
+        """
+        rate, burst = self._bucket(self.policies[policy_name])
+        limiter = self.limiters[policy_name]
+
+        def decorator(f):
+            @wraps(f)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return f(*args, **kwargs)
+
+                key = f"{policy_name}:{self.identity_fn()}"
+                allowed, retry_after = self.backend.take_token(key, rate, burst)
+                if not allowed:
+                    return self._rejected(retry_after)
+
+                account = account_fn() if account_fn else None
+                if account:
+                    allowed, retry_after = self.backend.take_token(
+                        f"{policy_name}:account:{account}", rate, burst)
+                    if not allowed:
+                        return self._rejected(retry_after)
+
+                if not limiter.try_acquire():
+                    response = jsonify({"message": "Server busy, try again shortly"})
+                    response.headers["Retry-After"] = "1"
+                    return response, 503
+
+                started = time.perf_counter()
+                failed = True
+                try:
+                    result = f(*args, **kwargs)
+                    status = result[1] if isinstance(result, tuple) and len(result) > 1 else 200
+                    failed = isinstance(status, int) and status >= 500
+                    return result
+                finally:
+                    limiter.release((time.perf_counter() - started) * 1000, failed=failed)
+
+            return wrapper
+
+        return decorator
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "backend": type(self.backend).__name__,
+            "workers": self.workers,
+            "limiters": {name: l.stats() for name, l in self.limiters.items()},
+        }
+
+
+def backend_from_env():
+    if os.environ.get("RATE_LIMIT_BACKEND", "memory").lower() == "mongo":
+        from db import rate_limits_collection
+        return MongoRateLimitBackend(rate_limits_collection)
+    return InMemoryRateLimitBackend()
@@ -8,23 +8,259 @@ import tensorflow as tf
 from tensorflow import keras
 from tensorflow.keras import layers
 import xgboost as xgb
+import joblib
+import json
+import os
+import threading
+import time
 import warnings
 warnings.filterwarnings('ignore')
 
+from eligibility_rules import evaluate_criteria
+
+# Published model versions live here (see training_pipeline.py)
+MODEL_DIR = os.environ.get("MODEL_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "models"))
+CURRENT_POINTER = "CURRENT"
+
+# How often workers check for a newly published model version
+MODEL_POLL_SECONDS = float(os.environ.get("MODEL_POLL_SECONDS", 30))
+
+# Weights used to blend model probabilities into the final score
+BLEND_WEIGHTS = {
+    'ensemble': 0.35,
+    'deep_learning': 0.35,
+    'random_forest': 0.10,
+    'xgboost': 0.10,
+    'gradient_boosting': 0.10,
+}
+
+
+def build_estimators():
+    """Create the (unfitted) traditional ML models"""
+    models = {}
+
+    # 1. Random Forest Classifier
+    models['random_forest'] = RandomForestClassifier(
+        n_estimators=100,
+        max_depth=10,
+        random_state=42
+    )
+
+    # 2. Support Vector Machine
+    models['svm'] = SVC(
+        kernel='rbf',
+        probability=True,
+        random_state=42
+    )
+
+    # 3. Gradient Boosting Classifier
+    models['gradient_boosting'] = GradientBoostingClassifier(
+        n_estimators=100,
+        learning_rate=0.1,
+        max_depth=5,
+        random_state=42
+    )
+
+    # 4. XGBoost Classifier
+    models['xgboost'] = xgb.XGBClassifier(
+        n_estimators=100,
+        max_depth=5,
+        learning_rate=0.1,
+        random_state=42
+    )
+
+    # 5. Naive Bayes
+    models['naive_bayes'] = GaussianNB()
+
+    # 6. Decision Tree
+    models['decision_tree'] = DecisionTreeClassifier(
+        max_depth=10,
+        random_state=42
+    )
+
+    models['ensemble'] = VotingClassifier(
+        estimators=[
+            ('rf', models['random_forest']),
+            ('svm', models['svm']),
+            ('gb', models['gradient_boosting']),
+            ('xgb', models['xgboost'])
+        ],
+        voting='soft'
+    )
+
+    return models
+
+
+def build_deep_learning_model():
+    """Create and compile the deep neural network for eligibility prediction"""
+    model = keras.Sequential([
+        layers.Input(shape=(6,)),  # 6 features
+        layers.Dense(128, activation='relu'),
+        layers.Dropout(0.3),
+        layers.Dense(64, activation='relu'),
+        layers.Dropout(0.2),
+        layers.Dense(32, activation='relu'),
+        layers.Dropout(0.2),
+        layers.Dense(16, activation='relu'),
+        layers.Dense(1, activation='sigmoid')
+    ])
+
+    model.compile(
+        optimizer='adam',
+        loss='binary_crossentropy',
+        metrics=['accuracy']
+    )
+    return model
+
+
+def blend_probabilities(predictions):
+    return sum(predictions[name] * weight for name, weight in BLEND_WEIGHTS.items())
+
+
+def _as_number(value):
+    """Profile fields are stored as the client sent them; anything unparseable encodes as 0"""
+    try:
+        number = float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+    return number if np.isfinite(number) else 0.0
+
+
+def _as_text(value, default):
+    return str(value) if value else default
+
+
+def encode_profile(user_profile):
+    """Feature row: [age, income_bracket, caste_code, gender_code, education_level, employment_status]"""
+    age = int(_as_number(user_profile.get('age')))
+
+    # Income brackets
+    income = _as_number(user_profile.get('income'))
+    if income < 100000:
+        income_bracket = 0  # Very low
+    elif income < 250000:
+        income_bracket = 1  # Low
+    elif income < 500000:
+        income_bracket = 2  # Medium
+    else:
+        income_bracket = 3  # High
+
+    # Caste encoding
+    caste = _as_text(user_profile.get('caste'), 'General').upper()
+    caste_map = {'GENERAL': 0, 'SC': 1, 'ST': 1, 'OBC': 2, 'EWS': 3}
+    caste_code = caste_map.get(caste, 0)
+
+    # Gender encoding
+    gender = _as_text(user_profile.get('gender'), 'Male').lower()
+    gender_code = 1 if gender == 'female' else 0
+
+    # Education level encoding
+    education = _as_text(user_profile.get('education'), 'Graduate').lower()
+    education_map = {
+        'primary': 0,
+        '10th': 1,
+        '12th': 1,
+        'graduate': 2,
+        'postgraduate': 3,
+        'diploma': 2
+    }
+    education_level = education_map.get(education, 2)
+
+    # Employment status (assuming employed if income > 0)
+    employment_status = 1 if income > 0 else 0
+
+    return [age, income_bracket, caste_code, gender_code, education_level, employment_status]
+
+
+def encode_profiles(user_profiles):
+    return np.array([encode_profile(p) for p in user_profiles], dtype=float).reshape(-1, 6)
+
+
+class ModelBundle:
+    """A fitted scaler, the traditional models and the deep learning model, swapped as one unit"""
+
+    def __init__(self, scaler, models, deep_learning_model, version="bootstrap", metrics=None):
+        self.scaler = scaler
+        self.models = models
+        self.deep_learning_model = deep_learning_model
+        self.version = version
+        self.metrics = metrics or {}
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        joblib.dump({'scaler': self.scaler, 'models': self.models}, os.path.join(path, 'estimators.joblib'))
+        self.deep_learning_model.save(os.path.join(path, 'deep_learning.keras'))
+        with open(os.path.join(path, 'metadata.json'), 'w') as f:
+            json.dump({'version': self.version, 'metrics': self.metrics}, f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        estimators = joblib.load(os.path.join(path, 'estimators.joblib'))
+        deep_learning_model = keras.models.load_model(os.path.join(path, 'deep_learning.keras'))
+        with open(os.path.join(path, 'metadata.json')) as f:
+            metadata = json.load(f)
+        return cls(
+            estimators['scaler'],
+            estimators['models'],
+            deep_learning_model,
+            version=metadata['version'],
+            metrics=metadata.get('metrics')
+        )
+
+
+def read_current_version(model_dir=MODEL_DIR):
+    try:
+        with open(os.path.join(model_dir, CURRENT_POINTER)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
 class EligibilityChecker:
-    def __init__(self):
-        self.scaler = StandardScaler()
-        self.models = {}
-        self.deep_learning_model = None
+    def __init__(self, model_dir=MODEL_DIR):
+        self.model_dir = model_dir
+        self._bundle = None
+        self._reload_lock = threading.Lock()
+        self._next_poll = 0.0
         self._initialize_models()
-    
+
+    # The active bundle is replaced by a single reference assignment, so a
+    # request that captured it keeps using one consistent set of models.
+    @property
+    def models(self):
+        return self._bundle.models
+
+    @property
+    def scaler(self):
+        return self._bundle.scaler
+
+    @property
+    def deep_learning_model(self):
+        return self._bundle.deep_learning_model
+
+    @property
+    def model_version(self):
+        return self._bundle.version
+
     def _initialize_models(self):
-        """Initialize multiple ML and Deep Learning models for eligibility checking"""
-        
+        """Load the published model version, or train the bootstrap models if there is none"""
+        version = read_current_version(self.model_dir)
+        if version:
+            try:
+                self._bundle = self._load_version(version)
+                return
+            except Exception as e:
+                print(f"[v0] Could not load model version {version}: {str(e)}")
+
+        self._bundle = self._train_bootstrap_bundle()
+
+    def _train_bootstrap_bundle(self):
+        """Train multiple ML and Deep Learning models on the built-in sample data"""
+
         # Create enhanced training data
         # Features: [age, income_bracket, caste_code, gender_code, education_level, employment_status]
         np.random.seed(42)
-        
+
         # Generate more diverse training samples
         X_sample = np.array([
             [25, 1, 0, 0, 2, 1],  # Young, low income, general, male, graduate, employed
@@ -43,218 +279,121 @@ class EligibilityChecker:
             [70, 0, 0, 1, 0, 0],  # Senior, very low income, general, female, primary, unemployed
             [26, 1, 3, 1, 2, 0],  # Young, low income, EWS, female, graduate, unemployed
         ])
-        
+
         # Target labels: 1 = eligible for schemes, 0 = not eligible
         y_sample = np.array([1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 0, 1, 1, 1, 1])
-        
+
         # Scale the features
-        X_scaled = self.scaler.fit_transform(X_sample)
-        
-        # 1. Random Forest Classifier
-        self.models['random_forest'] = RandomForestClassifier(
-            n_estimators=100, 
-            max_depth=10,
-            random_state=42
-        )
-        
-        # 2. Support Vector Machine
-        self.models['svm'] = SVC(
-            kernel='rbf',
-            probability=True,
-            random_state=42
-        )
-        
-        # 3. Gradient Boosting Classifier
-        self.models['gradient_boosting'] = GradientBoostingClassifier(
-            n_estimators=100,
-            learning_rate=0.1,
-            max_depth=5,
-            random_state=42
-        )
-        
-        # 4. XGBoost Classifier
-        self.models['xgboost'] = xgb.XGBClassifier(
-            n_estimators=100,
-            max_depth=5,
-            learning_rate=0.1,
-            random_state=42
-        )
-        
-        # 5. Naive Bayes
-        self.models['naive_bayes'] = GaussianNB()
-        
-        # 6. Decision Tree
-        self.models['decision_tree'] = DecisionTreeClassifier(
-            max_depth=10,
-            random_state=42
-        )
-        
-        self.models['ensemble'] = VotingClassifier(
-            estimators=[
-                ('rf', self.models['random_forest']),
-                ('svm', self.models['svm']),
-                ('gb', self.models['gradient_boosting']),
-                ('xgb', self.models['xgboost'])
-            ],
-            voting='soft'
-        )
-        
+        scaler = StandardScaler()
+        X_scaled = scaler.fit_transform(X_sample)
+
         # Train all models
-        for name, model in self.models.items():
+        models = build_estimators()
+        for name, model in models.items():
             model.fit(X_scaled, y_sample)
-        
-        self._build_deep_learning_model(X_scaled, y_sample)
-    
-    def _build_deep_learning_model(self, X_train, y_train):
-        """Build and train a deep neural network for eligibility prediction"""
-        
-        # Create a deep neural network
-        self.deep_learning_model = keras.Sequential([
-            layers.Input(shape=(6,)),  # 6 features
-            layers.Dense(128, activation='relu'),
-            layers.Dropout(0.3),
-            layers.Dense(64, activation='relu'),
-            layers.Dropout(0.2),
-            layers.Dense(32, activation='relu'),
-            layers.Dropout(0.2),
-            layers.Dense(16, activation='relu'),
-            layers.Dense(1, activation='sigmoid')
-        ])
-        
-        # Compile the model
-        self.deep_learning_model.compile(
-            optimizer='adam',
-            loss='binary_crossentropy',
-            metrics=['accuracy']
-        )
-        
-        # Train the model (silently)
-        self.deep_learning_model.fit(
-            X_train, y_train,
+
+        # Train the deep learning model (silently)
+        deep_learning_model = build_deep_learning_model()
+        deep_learning_model.fit(
+            X_scaled, y_sample,
             epochs=50,
             batch_size=4,
             verbose=0,
             validation_split=0.2
         )
-    
+
+        return ModelBundle(scaler, models, deep_learning_model)
+
+    def _load_version(self, version):
+        bundle = ModelBundle.load(os.path.join(self.model_dir, version))
+        # Run one prediction so TensorFlow traces the graph before the
+        # bundle serves traffic
+        probe = bundle.scaler.transform(self.encode_features({}))
+        bundle.deep_learning_model.predict(probe, verbose=0)
+        for model in bundle.models.values():
+            model.predict_proba(probe)
+        return bundle
+
+    def maybe_reload(self):
+        """Pick up a newly published model version without blocking the caller"""
+        now = time.monotonic()
+        if now < self._next_poll:
+            return
+        self._next_poll = now + MODEL_POLL_SECONDS
+
+        version = read_current_version(self.model_dir)
+        if not version or version == self._bundle.version:
+            return
+        if not self._reload_lock.acquire(blocking=False):
+            return  # another thread is already loading
+
+        def load():
+            try:
+                self._bundle = self._load_version(version)
+                print(f"[v0] Switched to model version {version}")
+            except Exception as e:
+                print(f"[v0] Could not load model version {version}: {str(e)}")
+            finally:
+                self._reload_lock.release()
+
+        threading.Thread(target=load, name="model-reload", daemon=True).start()
+
     def encode_features(self, user_profile):
         """Convert user profile to numerical features"""
-        age = user_profile.get('age', 0)
-        
-        # Income brackets
-        income = user_profile.get('income', 0)
-        if income < 100000:
-            income_bracket = 0  # Very low
-        elif income < 250000:
-            income_bracket = 1  # Low
-        elif income < 500000:
-            income_bracket = 2  # Medium
-        else:
-            income_bracket = 3  # High
-        
-        # Caste encoding
-        caste = user_profile.get('caste', 'General').upper()
-        caste_map = {'GENERAL': 0, 'SC': 1, 'ST': 1, 'OBC': 2, 'EWS': 3}
-        caste_code = caste_map.get(caste, 0)
-        
-        # Gender encoding
-        gender = user_profile.get('gender', 'Male').lower()
-        gender_code = 1 if gender == 'female' else 0
-        
-        # Education level encoding
-        education = user_profile.get('education', 'Graduate').lower()
-        education_map = {
-            'primary': 0,
-            '10th': 1,
-            '12th': 1,
-            'graduate': 2,
-            'postgraduate': 3,
-            'diploma': 2
-        }
-        education_level = education_map.get(education, 2)
-        
-        # Employment status (assuming employed if income > 0)
-        employment_status = 1 if income > 0 else 0
-        
-        return np.array([[age, income_bracket, caste_code, gender_code, education_level, employment_status]])
-    
+        return np.array([encode_profile(user_profile)])
+
+    def encode_features_batch(self, user_profiles):
+        """Convert many user profiles to a feature matrix, one row per profile"""
+        return encode_profiles(user_profiles)
+
+    def score_profile(self, user_profile):
+        """Blended eligibility probability and per-model predictions for a profile"""
+        self.maybe_reload()
+        bundle = self._bundle
+
+        # Encode features
+        features = self.encode_features(user_profile)
+        features_scaled = bundle.scaler.transform(features)
+
+        predictions = {}
+
+        # Traditional ML models
+        for name, model in bundle.models.items():
+            predictions[name] = model.predict_proba(features_scaled)[0][1]
+
+        dl_prediction = bundle.deep_learning_model.predict(features_scaled, verbose=0)[0][0]
+        predictions['deep_learning'] = float(dl_prediction)
+
+        return float(blend_probabilities(predictions)), predictions
+
+    def explain(self, user_profile, scheme, probability, predictions):
+        """Turn a score from score_profile into (eligible, confidence, reason) for `scheme`"""
+        is_eligible = probability > 0.5
+        reasons = self._generate_reasons(user_profile, scheme, is_eligible, predictions)
+        return is_eligible, probability, reasons
+
     def check_eligibility(self, user_profile, scheme):
         """Check eligibility using ensemble of ML models and deep learning"""
-        
+
         # Rule-based checks first
         rules_passed = self._check_rules(user_profile, scheme)
-        
+
         if not rules_passed:
             return False, 0.0, "Does not meet basic eligibility criteria"
-        
-        # Encode features
-        features = self.encode_features(user_profile)
-        features_scaled = self.scaler.transform(features)
-        
+
         try:
-            predictions = {}
-            
-            # Traditional ML models
-            predictions['random_forest'] = self.models['random_forest'].predict_proba(features_scaled)[0][1]
-            predictions['svm'] = self.models['svm'].predict_proba(features_scaled)[0][1]
-            predictions['gradient_boosting'] = self.models['gradient_boosting'].predict_proba(features_scaled)[0][1]
-            predictions['xgboost'] = self.models['xgboost'].predict_proba(features_scaled)[0][1]
-            predictions['naive_bayes'] = self.models['naive_bayes'].predict_proba(features_scaled)[0][1]
-            predictions['decision_tree'] = self.models['decision_tree'].predict_proba(features_scaled)[0][1]
-            predictions['ensemble'] = self.models['ensemble'].predict_proba(features_scaled)[0][1]
-            
-            dl_prediction = self.deep_learning_model.predict(features_scaled, verbose=0)[0][0]
-            predictions['deep_learning'] = float(dl_prediction)
-            
-            final_probability = (
-                predictions['ensemble'] * 0.35 +
-                predictions['deep_learning'] * 0.35 +
-                predictions['random_forest'] * 0.10 +
-                predictions['xgboost'] * 0.10 +
-                predictions['gradient_boosting'] * 0.10
-            )
-            
-            is_eligible = final_probability > 0.5
-            
-            reasons = self._generate_reasons(user_profile, scheme, is_eligible, predictions)
-            
-            return is_eligible, float(final_probability), reasons
-            
+            probability, predictions = self.score_profile(user_profile)
+            return self.explain(user_profile, scheme, probability, predictions)
+
         except Exception as e:
             print(f"[v0] ML prediction error: {str(e)}")
             return True, 0.75, "Meets eligibility criteria"
-    
+
     def _check_rules(self, user_profile, scheme):
         """Rule-based eligibility checking"""
-        criteria = scheme.get('eligibility_criteria', {})
-        
-        # Age check
-        if 'min_age' in criteria:
-            if user_profile.get('age', 0) < criteria['min_age']:
-                return False
-        
-        if 'max_age' in criteria:
-            if user_profile.get('age', 999) > criteria['max_age']:
-                return False
-        
-        # Income check
-        if 'max_income' in criteria:
-            if user_profile.get('income', 0) > criteria['max_income']:
-                return False
-        
-        # Caste check
-        if 'caste' in criteria:
-            allowed_castes = [c.upper() for c in criteria['caste']]
-            if user_profile.get('caste', '').upper() not in allowed_castes:
-                return False
-        
-        # Gender check
-        if 'gender' in criteria:
-            if user_profile.get('gender', '').lower() != criteria['gender'].lower():
-                return False
-        
-        return True
-    
+        eligible, _, _ = evaluate_criteria(user_profile, scheme.get('eligibility_criteria', {}))
+        return eligible
+
     def _generate_reasons(self, user_profile, scheme, is_eligible, predictions):
         """Generate human-readable reasons with model confidence breakdown"""
         if is_eligible:
@@ -265,5 +404,23 @@ class EligibilityChecker:
         else:
             return "Does not meet all required criteria based on ML analysis"
 
-# Global instance
-eligibility_checker = EligibilityChecker()
+# Global instance, built on first use: constructing it loads (or trains) the
+# models, which modules that only need the helpers above must not pay for
+_eligibility_checker = None
+_eligibility_checker_lock = threading.Lock()
+
+
+def get_eligibility_checker():
+    global _eligibility_checker
+    if _eligibility_checker is None:
+        with _eligibility_checker_lock:
+            if _eligibility_checker is None:
+                _eligibility_checker = EligibilityChecker()
+    return _eligibility_checker
+
+
+def __getattr__(name):
+    # Keeps `from ml_eligibility import eligibility_checker` working, lazily
+    if name == "eligibility_checker":
+        return get_eligibility_checker()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,233 @@
+# backend/profiling.py
+"""
+Opt-in per-request profiling.
+
+When PROFILING_ENABLED=true, a request is profiled if it carries
+`X-Profile: 1` from an authenticated admin, or is picked by
+PROFILE_SAMPLE_RATE. A sampler thread records the request thread's stack
+every PROFILE_INTERVAL_MS, and every MongoDB command issued during the
+request is logged with its duration. Each profile is written to PROFILE_DIR
+as:
+
+    <id>.folded   collapsed stacks, ready for flamegraph.pl / speedscope
+    <id>.json     request metadata and the Mongo calls
+
+Only the newest PROFILE_MAX_FILES profiles are kept. When profiling is
+disabled, no hooks or listeners are installed.
+"""
+from collections import Counter
+from datetime import datetime
+from flask import g, request
+from pymongo import monitoring
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "false").lower() == "true"
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0))
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", 5))
+PROFILE_MAX_FILES = int(os.environ.get("PROFILE_MAX_FILES", 50))
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles"))
+
+PROFILE_HEADER = "X-Profile"
+_PROFILE_ID = re.compile(r"^[\w-]+$")
+
+_active = threading.local()
+
+
+class StackSampler:
+    """Samples one thread's stack on a background thread and counts collapsed stacks"""
+
+    def __init__(self, thread_id, interval_ms=PROFILE_INTERVAL_MS):
+        self.thread_id = thread_id
+        self.interval = interval_ms / 1000.0
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                             .replace(";", ":"))
+                frame = frame.f_back
+            self.counts[";".join(reversed(stack))] += 1
+
+    def folded(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
+
+
+class MongoCallRecorder(monitoring.CommandListener):
+    """Logs commands issued by the thread of a request that is being profiled"""
+
+    def started(self, event):
+        calls = getattr(_active, "mongo_calls", None)
+        if calls is None:
+            return
+        collection = event.command.get(event.command_name)
+        _active.pending[event.request_id] = {
+            "command": event.command_name,
+            "database": event.database_name,
+            "collection": collection if isinstance(collection, str) else None,
+        }
+
+    def succeeded(self, event):
+        self._finish(event, ok=True)
+
+    def failed(self, event):
+        self._finish(event, ok=False)
+
+    def _finish(self, event, ok):
+        calls = getattr(_active, "mongo_calls", None)
+        if calls is None:
+            return
+        call = _active.pending.pop(event.request_id, {"command": event.command_name})
+        call["duration_ms"] = round(event.duration_micros / 1000, 3)
+        call["ok"] = ok
+        calls.append(call)
+
+
+# ------------------------------------------------------------------------------------------------------
+# RING BUFFER ON DISK
+# ------------------------------------------------------------------------------------------------------
+
+def _write_profile(profile_id, folded, metadata):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    for suffix, content in ((".folded", folded), (".json", json.dumps(metadata, indent=2))):
+        tmp = os.path.join(PROFILE_DIR, f".{profile_id}{suffix}.tmp")
+        with open(tmp, "w") as f:
+            f.write(content)
+        os.replace(tmp, os.path.join(PROFILE_DIR, profile_id + suffix))
+
+    # Profile ids start with a timestamp, so name order is age order
+    profile_ids = sorted({name.rsplit(".", 1)[0] for name in os.listdir(PROFILE_DIR)
+                          if not name.startswith(".")})
+    for old in profile_ids[:-PROFILE_MAX_FILES]:
+        for suffix in (".folded", ".json"):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, old + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles():
+    """Metadata of stored profiles, newest first"""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(PROFILE_DIR), reverse=True):
+        if name.endswith(".json") and not name.startswith("."):
+            try:
+                with open(os.path.join(PROFILE_DIR, name)) as f:
+                    metadata = json.load(f)
+            except (OSError, ValueError):
+                continue
+            metadata.pop("mongo_calls", None)
+            profiles.append(metadata)
+    return profiles
+
+
+def profile_file(profile_id, kind):
+    """(directory, filename) of a stored profile, or None"""
+    suffix = {"folded": ".folded", "json": ".json"}.get(kind)
+    if not suffix or not _PROFILE_ID.match(profile_id):
+        return None
+    filename = profile_id + suffix
+    if not os.path.isfile(os.path.join(PROFILE_DIR, filename)):
+        return None
+    return PROFILE_DIR, filename
+
+
+# ------------------------------------------------------------------------------------------------------
+# FLASK HOOKS
+# ------------------------------------------------------------------------------------------------------
+
+def init_profiling(app, mongo, is_admin):
+    """Install the profiling hooks on `app` if profiling is enabled"""
+    if not PROFILING_ENABLED:
+        return False
+
+    mongo.add_event_listener(MongoCallRecorder())
+
+    def should_profile():
+        if request.headers.get(PROFILE_HEADER) == "1" and is_admin():
+            return "header"
+        if PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE:
+            return "sampled"
+        return None
+
+    @app.before_request
+    def start_profile():
+        trigger = should_profile()
+        if not trigger:
+            return
+
+        sampler = StackSampler(threading.get_ident())
+        _active.mongo_calls = []
+        _active.pending = {}
+        g.profile = {
+            "id": f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}-{uuid.uuid4().hex[:8]}",
+            "trigger": trigger,
+            "sampler": sampler,
+            "started": time.perf_counter(),
+        }
+        sampler.start()
+
+    @app.after_request
+    def tag_profile(response):
+        profile = g.get("profile")
+        if profile:
+            response.headers["X-Profile-Id"] = profile["id"]
+            profile["status"] = response.status_code
+        return response
+
+    @app.teardown_request
+    def finish_profile(exc):
+        profile = g.pop("profile", None)
+        if not profile:
+            return
+
+        profile["sampler"].stop()
+        duration_ms = (time.perf_counter() - profile["started"]) * 1000
+        mongo_calls = _active.mongo_calls
+        _active.mongo_calls = None
+        _active.pending = {}
+
+        metadata = {
+            "id": profile["id"],
+            "method": request.method,
+            "path": request.path,
+            "endpoint": request.endpoint,
+            "status": profile.get("status", 500),
+            "trigger": profile["trigger"],
+            "duration_ms": round(duration_ms, 3),
+            "samples": sum(profile["sampler"].counts.values()),
+            "interval_ms": PROFILE_INTERVAL_MS,
+            "mongo_time_ms": round(sum(c.get("duration_ms", 0) for c in mongo_calls), 3),
+            "mongo_calls": mongo_calls,
+            "created_at": datetime.utcnow().isoformat(),
+        }
+        try:
+            _write_profile(profile["id"], profile["sampler"].folded(), metadata)
+        except OSError as e:
+            print(f"[PROFILING] Could not write profile {profile['id']}: {str(e)}")
+
+    print(f"[PROFILING] Enabled (sample rate {PROFILE_SAMPLE_RATE}, dir {PROFILE_DIR})")
+    return True
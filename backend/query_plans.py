@@ -0,0 +1,222 @@
+# backend/query_plans.py
+"""
+Query-plan verification for every query shape the app issues.
+
+Run against a scratch database on a local MongoDB:
+
+    python query_plans.py mongodb://localhost:27017
+
+The registry indexes are reconciled into the scratch database, then each
+shape in QUERY_SHAPES is explained. The run fails (exit code 1) when a shape
+uses a collection scan, sorts in memory, joins with $lookup without an index
+on the foreign field, or - for shapes marked `covered` - has to fetch
+documents to satisfy its projection.
+
+Shapes marked `count` describe count_documents() calls and are explained as
+the aggregation the driver actually sends for them:
+[{$match: filter}, {$group: {_id: 1, n: {$sum: 1}}}].
+
+When adding a query to app.py, add its shape here.
+"""
+from pymongo import MongoClient
+from bson import ObjectId
+import sys
+
+from indexes import reconcile_indexes
+
+# Placeholder values; only the shape of each query matters to the planner.
+_AADHAAR = "123456789012"
+_SCHEME_ID = "00000000-0000-0000-0000-000000000000"
+_DATE = "2024-01-01T00:00:00"
+
+QUERY_SHAPES = [
+    # users
+    {"name": "register: existing user check", "collection": "users",
+     "filter": {"aadhaar": _AADHAAR}, "projection": {"_id": 0, "aadhaar": 1},
+     "covered": True},
+    {"name": "login / token_required: user by aadhaar", "collection": "users",
+     "filter": {"aadhaar": _AADHAAR}, "projection": {"_id": 0}},
+    {"name": "admin enriched applications: applicants from a state", "collection": "users",
+     "filter": {"state": "Kerala"}, "projection": {"_id": 0, "aadhaar": 1}, "covered": True},
+    {"name": "admin enriched applications: $lookup of the applicant", "collection": "users",
+     "filter": {"aadhaar": _AADHAAR},
+     "projection": {"_id": 0, "name": 1, "state": 1, "district": 1}, "limit": 1},
+
+    # schemes
+    {"name": "all_schemes / eligible: full catalog", "collection": "schemes",
+     "filter": {}, "projection": {"_id": 0}, "full_scan": True},
+    {"name": "get_scheme: by UUID id", "collection": "schemes",
+     "filter": {"id": _SCHEME_ID}, "projection": {"_id": 0}},
+    {"name": "admin enriched applications: $lookup of the scheme", "collection": "schemes",
+     "filter": {"id": _SCHEME_ID}, "projection": {"_id": 0, "name": 1, "category": 1}, "limit": 1},
+    {"name": "release: is the catalog empty (init_sample_schemes)", "collection": "schemes",
+     "count": True, "filter": {}, "full_scan": True},
+    {"name": "get_scheme: legacy ObjectId fallback", "collection": "schemes",
+     "filter": {"_id": ObjectId("000000000000000000000000")}, "projection": {"_id": 0}},
+    {"name": "admin_update_scheme / admin_delete_scheme: by id", "collection": "schemes",
+     "filter": {"id": _SCHEME_ID}},
+    {"name": "schemes/changes: written since revision", "collection": "schemes",
+     "filter": {"revision": {"$gt": 0}}, "projection": {"_id": 0},
+     "sort": [("revision", 1)], "limit": 501},
+    {"name": "schemes/changes: deleted since revision", "collection": "scheme_tombstones",
+     "filter": {"revision": {"$gt": 0}}, "projection": {"_id": 0, "id": 1, "revision": 1},
+     "sort": [("revision", 1)], "limit": 501},
+    {"name": "migrate_scheme_ids: schemes without an id", "collection": "schemes",
+     "filter": {"id": {"$in": [None, ""]}}, "projection": {"_id": 1}},
+    {"name": "migrate_scheme_revisions: schemes without revision", "collection": "schemes",
+     "filter": {"revision": {"$exists": False}}, "projection": {"_id": 1}},
+    {"name": "bulk import: upsert by id", "collection": "schemes",
+     "filter": {"id": _SCHEME_ID}},
+    {"name": "bulk import: job by id", "collection": "scheme_import_jobs",
+     "filter": {"job_id": "job"}, "projection": {"_id": 0}},
+    {"name": "bulk import: claim or expire a job", "collection": "scheme_import_jobs",
+     "filter": {"job_id": "job", "status": "running", "updated_at": _DATE}},
+    {"name": "bulk import: job listing, newest first", "collection": "scheme_import_jobs",
+     "filter": {}, "projection": {"_id": 0, "errors": 0},
+     "sort": [("started_at", -1)], "limit": 50},
+    {"name": "bulk export: full catalog", "collection": "schemes",
+     "filter": {}, "projection": {"_id": 0, "id": 1, "name": 1}, "full_scan": True},
+    {"name": "catalog cache / changes: revision counter", "collection": "counters",
+     "filter": {"_id": "scheme_revision"}},
+
+    # applications
+    {"name": "user_applications: own applications, newest first", "collection": "applications",
+     "filter": {"aadhaar": _AADHAAR}, "projection": {"_id": 0},
+     "sort": [("submitted_at", -1)]},
+    {"name": "admin_all_applications: newest first", "collection": "applications",
+     "filter": {}, "projection": {"_id": 0}, "sort": [("submitted_at", -1)]},
+    {"name": "applications by status, newest first", "collection": "applications",
+     "filter": {"status": "submitted"}, "projection": {"_id": 0},
+     "sort": [("submitted_at", -1)]},
+    {"name": "applications by scheme, newest first", "collection": "applications",
+     "filter": {"scheme_id": _SCHEME_ID, "submitted_at": {"$gte": _DATE}},
+     "projection": {"_id": 0}, "sort": [("submitted_at", -1)]},
+    {"name": "admin enriched applications: status + date range, newest first",
+     "collection": "applications",
+     "pipeline": [{"$match": {"status": "submitted", "submitted_at": {"$gte": _DATE}}},
+                  {"$sort": {"submitted_at": -1}}, {"$skip": 0}, {"$limit": 51}],
+     "sort": [("submitted_at", -1)]},
+    {"name": "admin enriched applications: by scheme, oldest first",
+     "collection": "applications",
+     "pipeline": [{"$match": {"scheme_id": _SCHEME_ID}},
+                  {"$sort": {"submitted_at": 1}}, {"$skip": 0}, {"$limit": 51}],
+     "sort": [("submitted_at", 1)]},
+    {"name": "admin enriched applications: state filter, by aadhaar, newest first",
+     "collection": "applications",
+     "pipeline": [{"$match": {"status": "submitted", "aadhaar": {"$in": [_AADHAAR, "210987654321"]}}},
+                  {"$sort": {"submitted_at": -1}}, {"$skip": 0}, {"$limit": 51}],
+     "sort": [("submitted_at", -1)]},
+    {"name": "admin enriched applications: count with state filter", "collection": "applications",
+     "count": True, "filter": {"aadhaar": {"$in": [_AADHAAR, "210987654321"]}}, "covered": True},
+    {"name": "admin enriched applications: count by status", "collection": "applications",
+     "count": True, "filter": {"status": "submitted"}, "covered": True},
+    {"name": "admin enriched applications: count by scheme and date", "collection": "applications",
+     "count": True, "filter": {"scheme_id": _SCHEME_ID, "submitted_at": {"$gte": _DATE}},
+     "covered": True},
+    # The unfiltered total uses estimated_document_count(), which reads
+    # collection metadata and has no query plan
+    {"name": "training_pipeline: decided applications", "collection": "applications",
+     "pipeline": [{"$match": {"status": {"$in": ["approved", "rejected"]}}},
+                  {"$project": {"_id": 0, "aadhaar": 1, "status": 1}}]},
+
+    # edit requests
+    {"name": "admin_all_requests: full list", "collection": "edit_requests",
+     "filter": {}, "projection": {"_id": 0}, "full_scan": True},
+
+    # digilocker
+    {"name": "digilocker: session by id", "collection": "digilocker_sessions",
+     "filter": {"session_id": "session"}, "projection": {"_id": 0}},
+]
+
+
+def _stages(plan):
+    """Yield every stage in an explain plan tree"""
+    if not isinstance(plan, dict):
+        return
+    if "stage" in plan:
+        yield plan
+    for key in ("inputStage", "queryPlan", "outerStage", "innerStage"):
+        if key in plan:
+            yield from _stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _stages(child)
+
+
+def _winning_plans(explain):
+    """Collect winning plans from find and aggregate explain output"""
+    if "queryPlanner" in explain:
+        yield explain["queryPlanner"]["winningPlan"]
+    for stage in explain.get("stages", []):
+        cursor = stage.get("$cursor")
+        if cursor and "queryPlanner" in cursor:
+            yield cursor["queryPlanner"]["winningPlan"]
+    for shard in explain.get("shards", {}).values():
+        yield from _winning_plans(shard)
+
+
+def count_pipeline(query_filter):
+    """The aggregation pymongo's count_documents() sends for `query_filter`"""
+    return [{"$match": query_filter}, {"$group": {"_id": 1, "n": {"$sum": 1}}}]
+
+
+def explain_shape(database, shape):
+    coll = database[shape["collection"]]
+    if shape.get("count"):
+        return database.command("aggregate", shape["collection"],
+                                pipeline=count_pipeline(shape.get("filter", {})), explain=True)
+    if "pipeline" in shape:
+        return database.command("aggregate", shape["collection"],
+                                pipeline=shape["pipeline"], explain=True)
+
+    cursor = coll.find(shape.get("filter", {}), shape.get("projection"))
+    if shape.get("sort"):
+        cursor = cursor.sort(shape["sort"])
+    if shape.get("limit"):
+        cursor = cursor.limit(shape["limit"])
+    return cursor.explain()
+
+
+def check_shape(database, shape):
+    """Return a list of problems with the winning plan for `shape` (empty when fine)"""
+    explain = explain_shape(database, shape)
+    stages = [s for plan in _winning_plans(explain) for s in _stages(plan)]
+    stage_names = [s["stage"] for s in stages]
+    problems = []
+
+    if "COLLSCAN" in stage_names and not shape.get("full_scan"):
+        problems.append("collection scan")
+    if shape.get("sort") and "SORT" in stage_names:
+        problems.append("in-memory sort")
+    if shape.get("covered") and "FETCH" in stage_names:
+        problems.append("projection not covered by index")
+    # Pushed-down $lookup stages name their join strategy
+    if any(s["stage"] == "EQ_LOOKUP" and s.get("strategy") != "IndexedLoopJoin" for s in stages):
+        problems.append("$lookup without an index on the foreign field")
+    return problems, stage_names
+
+
+def verify_query_plans(database, shapes=None):
+    """Reconcile indexes into `database` and check every query shape; returns failures"""
+    reconcile_indexes(database)
+    failures = []
+    for shape in QUERY_SHAPES if shapes is None else shapes:
+        problems, stage_names = check_shape(database, shape)
+        status = "FAIL" if problems else "ok"
+        print(f"[{status}] {shape['name']}: {' > '.join(stage_names)}"
+              + (f" ({', '.join(problems)})" if problems else ""))
+        if problems:
+            failures.append((shape["name"], problems))
+    return failures
+
+
+if __name__ == "__main__":
+    uri = sys.argv[1] if len(sys.argv) > 1 else "mongodb://localhost:27017"
+    scratch_db = "query_plan_check"
+    client = MongoClient(uri)
+    try:
+        client.drop_database(scratch_db)
+        failed = verify_query_plans(client[scratch_db])
+    finally:
+        client.drop_database(scratch_db)
+        client.close()
+    sys.exit(1 if failed else 0)
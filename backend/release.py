@@ -0,0 +1,32 @@
+# backend/release.py
+"""
+Deploy-time database setup, run once per release before new workers start
+(the `release` step in the Procfile):
+
+    python release.py           # reconcile indexes, seed, migrate
+    python release.py --prune   # also drop indexes not in the registry
+
+Nothing here runs when app.py is imported, so workers only open a MongoDB
+connection when they first need one.
+"""
+import sys
+
+from db import db, init_sample_schemes
+from indexes import reconcile_indexes
+from catalog_sync import migrate_scheme_ids, migrate_scheme_revisions
+
+
+def prepare_database(database, prune=False):
+    result = reconcile_indexes(database, prune=prune)
+    for action in ("created", "rebuilt", "dropped"):
+        for name in result[action]:
+            print(f"[INDEXES] {action}: {name}")
+    print(f"[INDEXES] {len(result['unchanged'])} index(es) already up to date")
+
+    init_sample_schemes()
+    migrate_scheme_ids()
+    migrate_scheme_revisions()
+
+
+if __name__ == "__main__":
+    prepare_database(db, prune="--prune" in sys.argv)
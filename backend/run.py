@@ -1,6 +1,11 @@
-from app import app
+from app import app, get_ml_checker
+from db import db
+from release import prepare_database
+import warmup
 
 if __name__ == '__main__':
+    prepare_database(db)
+    warmup.warm_up(get_ml_checker)
     print("🚀 Flask Backend Running on http://localhost:5000")
     print("💾 MongoDB Atlas connected")
     print("🤖 ML Eligibility Checker with Deep Learning initialized")
@@ -0,0 +1,215 @@
+# backend/training_pipeline.py
+"""
+Offline training from real application history.
+
+Streams decided applications (approved / rejected) joined with the
+applicant's profile, featurizes them in chunks, trains every estimator in
+parallel, evaluates on a holdout split and publishes the result as a new
+model version under MODEL_DIR if it is at least as accurate as the version
+currently published on the same holdout. Running workers notice the new
+CURRENT pointer and swap to it in the background
+(EligibilityChecker.maybe_reload).
+
+    python training_pipeline.py --chunk-size 5000 --holdout 0.2 --n-jobs -1
+"""
+from datetime import datetime
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.metrics import accuracy_score, roc_auc_score
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler
+import argparse
+import numpy as np
+import os
+import shutil
+import sys
+
+from db import applications_collection
+from ml_eligibility import (
+    ModelBundle,
+    MODEL_DIR,
+    CURRENT_POINTER,
+    read_current_version,
+    build_estimators,
+    build_deep_learning_model,
+    blend_probabilities,
+    encode_profiles,
+)
+
+# Application status -> training label
+LABELS = {"approved": 1, "rejected": 0}
+
+# Profile fields encode_features reads
+PROFILE_FIELDS = ["age", "income", "caste", "gender", "education"]
+
+
+def stream_labeled_profiles(chunk_size=5000):
+    """Yield lists of (profile, label) for decided applications, `chunk_size` at a time"""
+    pipeline = [
+        {"$match": {"status": {"$in": list(LABELS)}}},
+        {"$project": {"_id": 0, "aadhaar": 1, "status": 1}},
+        {"$lookup": {
+            "from": "users",
+            "localField": "aadhaar",
+            "foreignField": "aadhaar",
+            "pipeline": [{"$project": {"_id": 0, **{f: 1 for f in PROFILE_FIELDS}}}],
+            "as": "user"
+        }},
+        {"$unwind": "$user"},
+    ]
+    cursor = applications_collection.aggregate(pipeline, allowDiskUse=True, batchSize=chunk_size)
+
+    chunk = []
+    for row in cursor:
+        chunk.append((row["user"], LABELS[row["status"]]))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def build_dataset(chunk_size=5000):
+    """Featurize the streamed history; only the numeric arrays are kept in memory"""
+    X_parts, y_parts = [], []
+    for chunk in stream_labeled_profiles(chunk_size):
+        profiles, labels = zip(*chunk)
+        X_parts.append(encode_profiles(profiles))
+        y_parts.append(np.array(labels, dtype=int))
+        print(f"[TRAINING] Featurized {sum(len(y) for y in y_parts)} applications")
+
+    if not X_parts:
+        return np.empty((0, 6)), np.empty(0, dtype=int)
+    return np.vstack(X_parts), np.concatenate(y_parts)
+
+
+def _fit(name, estimator, X, y):
+    return name, estimator.fit(X, y)
+
+
+def train_bundle(X_train, y_train, n_jobs=-1, epochs=50):
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X_train)
+
+    # Each estimator is independent (the voting ensemble clones its members),
+    # so they are fitted in parallel worker processes.
+    estimators = build_estimators()
+    fitted = Parallel(n_jobs=n_jobs)(
+        delayed(_fit)(name, clone(est), X_scaled, y_train) for name, est in estimators.items()
+    )
+
+    deep_learning_model = build_deep_learning_model()
+    deep_learning_model.fit(
+        X_scaled, y_train,
+        epochs=epochs,
+        batch_size=64,
+        verbose=0,
+        validation_split=0.1
+    )
+
+    return ModelBundle(scaler, dict(fitted), deep_learning_model)
+
+
+def evaluate_bundle(bundle, X_test, y_test):
+    X_scaled = bundle.scaler.transform(X_test)
+    probabilities = {name: m.predict_proba(X_scaled)[:, 1] for name, m in bundle.models.items()}
+    probabilities['deep_learning'] = bundle.deep_learning_model.predict(X_scaled, verbose=0)[:, 0]
+    probabilities['blended'] = blend_probabilities(probabilities)
+
+    metrics = {}
+    for name, prob in probabilities.items():
+        metrics[name] = {"accuracy": float(accuracy_score(y_test, prob > 0.5))}
+        if len(set(y_test)) > 1:
+            metrics[name]["roc_auc"] = float(roc_auc_score(y_test, prob))
+    return metrics
+
+
+def load_current_bundle(model_dir=MODEL_DIR):
+    """The published bundle CURRENT points at, or None"""
+    version = read_current_version(model_dir)
+    if version is None:
+        return None
+    try:
+        return ModelBundle.load(os.path.join(model_dir, version))
+    except Exception as e:
+        print(f"[TRAINING] Could not load current model version {version}: {str(e)}")
+        return None
+
+
+def publish_bundle(bundle, model_dir=MODEL_DIR, keep=5):
+    """Write the bundle as a new version and atomically point CURRENT at it"""
+    os.makedirs(model_dir, exist_ok=True)
+    version = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+    bundle.version = version
+
+    staging = os.path.join(model_dir, f".staging-{version}")
+    bundle.save(staging)
+    os.replace(staging, os.path.join(model_dir, version))
+
+    pointer_tmp = os.path.join(model_dir, f".{CURRENT_POINTER}.tmp")
+    with open(pointer_tmp, "w") as f:
+        f.write(version)
+    os.replace(pointer_tmp, os.path.join(model_dir, CURRENT_POINTER))
+
+    # Keep the newest `keep` versions for rollback
+    versions = sorted(d for d in os.listdir(model_dir) if not d.startswith(".") and d != CURRENT_POINTER)
+    for old in versions[:-keep]:
+        shutil.rmtree(os.path.join(model_dir, old), ignore_errors=True)
+
+    return version
+
+
+def run(chunk_size=5000, holdout=0.2, n_jobs=-1, min_rows=100, min_accuracy=0.7, model_dir=MODEL_DIR):
+    X, y = build_dataset(chunk_size)
+
+    if len(y) < min_rows or len(set(y)) < 2:
+        print(f"[TRAINING] Not enough labelled history ({len(y)} rows, classes {sorted(set(y))}); nothing published")
+        return None
+
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=holdout, stratify=y, random_state=42
+    )
+    bundle = train_bundle(X_train, y_train, n_jobs=n_jobs)
+    bundle.metrics = evaluate_bundle(bundle, X_test, y_test)
+    bundle.metrics["rows"] = {"train": int(len(y_train)), "holdout": int(len(y_test))}
+
+    accuracy = bundle.metrics["blended"]["accuracy"]
+    print(f"[TRAINING] Holdout accuracy (blended): {accuracy:.3f}")
+    if accuracy < min_accuracy:
+        print(f"[TRAINING] Below minimum accuracy {min_accuracy}; nothing published")
+        return None
+
+    # Never replace the live models with worse ones: score them on the same holdout
+    current = load_current_bundle(model_dir)
+    if current is not None:
+        baseline = evaluate_bundle(current, X_test, y_test)["blended"]
+        bundle.metrics["baseline"] = {"version": current.version, **baseline}
+        print(f"[TRAINING] Holdout accuracy of current version {current.version}: {baseline['accuracy']:.3f}")
+        if accuracy < baseline["accuracy"]:
+            print("[TRAINING] Worse than the current version; nothing published")
+            return None
+
+    version = publish_bundle(bundle, model_dir)
+    print(f"[TRAINING] Published model version {version}")
+    return version
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train eligibility models from application history")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--holdout", type=float, default=0.2)
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    parser.add_argument("--min-rows", type=int, default=100)
+    parser.add_argument("--min-accuracy", type=float, default=0.7)
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    args = parser.parse_args()
+
+    published = run(
+        chunk_size=args.chunk_size,
+        holdout=args.holdout,
+        n_jobs=args.n_jobs,
+        min_rows=args.min_rows,
+        min_accuracy=args.min_accuracy,
+        model_dir=args.model_dir,
+    )
+    sys.exit(0 if published else 1)
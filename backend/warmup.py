@@ -0,0 +1,140 @@
+# backend/warmup.py
+"""
+Per-worker warm-up and readiness.
+
+warm_up() does the lazy first-request work up front: it opens MongoDB
+connections, loads the scheme catalog cache, and runs synthetic profiles
+through every model so TensorFlow traces its graph. Under gunicorn it runs
+in post_worker_init (see gunicorn.conf.py), before the worker accepts
+connections. /readyz reports 503 until it has finished; /healthz only
+says the process is alive.
+
+A failed warm-up (e.g. MongoDB briefly unreachable) is retried with
+exponential backoff, started by the next /readyz probe once the delay has
+passed, so a transient failure does not keep a worker out of rotation.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import os
+import threading
+import time
+
+from db import mongo
+from catalog_sync import catalog_cache
+
+WARMUP_CONNECTIONS = int(os.environ.get("WARMUP_CONNECTIONS", 4))
+WARMUP_ML = os.environ.get("WARMUP_ML", "true").lower() == "true"
+WARMUP_RETRY_SECONDS = float(os.environ.get("WARMUP_RETRY_SECONDS", 2))
+WARMUP_RETRY_MAX_SECONDS = float(os.environ.get("WARMUP_RETRY_MAX_SECONDS", 60))
+
+# Profiles covering each branch of the feature encoder
+SYNTHETIC_PROFILES = [
+    {"age": 25, "income": 80000, "caste": "SC", "gender": "Female", "education": "12th"},
+    {"age": 45, "income": 300000, "caste": "OBC", "gender": "Male", "education": "Graduate"},
+    {"age": 68, "income": 0, "caste": "General", "gender": "Female", "education": "Primary"},
+    {"age": 35, "income": 900000, "caste": "EWS", "gender": "Male", "education": "Postgraduate"},
+]
+
+_state = {
+    "ready": False,
+    "started_at": None,
+    "finished_at": None,
+    "attempts": 0,
+    "retry_at": None,
+    "steps": {},
+}
+_lock = threading.Lock()
+
+
+def _step(name, fn):
+    started = time.perf_counter()
+    try:
+        detail = fn()
+        _state["steps"][name] = {"ok": True, "ms": round((time.perf_counter() - started) * 1000, 1)}
+        if detail is not None:
+            _state["steps"][name]["detail"] = detail
+        return True
+    except Exception as e:
+        _state["steps"][name] = {"ok": False, "error": str(e)}
+        print(f"[WARMUP] {name} failed: {str(e)}")
+        return False
+
+
+def _open_mongo_pool():
+    # Concurrent pings make the pool open several connections, not just one
+    with ThreadPoolExecutor(max_workers=WARMUP_CONNECTIONS) as pool:
+        list(pool.map(lambda _: mongo.client.admin.command("ping"), range(WARMUP_CONNECTIONS)))
+    return {"connections": mongo.pool_stats()["open_connections"]}
+
+
+def _load_catalog():
+    return {"schemes": len(catalog_cache.refresh())}
+
+
+def _score_models(get_ml_checker):
+    checker = get_ml_checker()
+    for profile in SYNTHETIC_PROFILES:
+        checker.score_profile(profile)
+    return {"model_version": checker.model_version}
+
+
+def _due():
+    """Nothing has run yet, or the last attempt failed and its backoff has passed"""
+    if _state["ready"]:
+        return False
+    return _state["retry_at"] is None or time.monotonic() >= _state["retry_at"]
+
+
+def warm_up(get_ml_checker=None):
+    """Run every warm-up step; once ready, or while backing off after a failure, return the recorded state"""
+    with _lock:
+        if _state["attempts"] and not _due():
+            return status()
+
+        _state["attempts"] += 1
+        _state["started_at"] = datetime.utcnow().isoformat()
+        _state["finished_at"] = None
+        _state["steps"] = {}
+        ok = _step("mongo", _open_mongo_pool)
+        ok = _step("catalog", _load_catalog) and ok
+        if WARMUP_ML and get_ml_checker is not None:
+            # ML mode falls back to the rules, so a failure here does not
+            # block readiness
+            _step("ml_models", lambda: _score_models(get_ml_checker))
+
+        _state["ready"] = ok
+        _state["finished_at"] = datetime.utcnow().isoformat()
+        if ok:
+            _state["retry_at"] = None
+        else:
+            delay = min(WARMUP_RETRY_MAX_SECONDS, WARMUP_RETRY_SECONDS * 2 ** (_state["attempts"] - 1))
+            _state["retry_at"] = time.monotonic() + delay
+        print(f"[WARMUP] pid {os.getpid()} {'ready' if ok else 'NOT ready'} "
+              f"(attempt {_state['attempts']}): {_state['steps']}")
+        return status()
+
+
+def start_in_background(get_ml_checker=None):
+    """
+    Start warm-up on a thread if nothing has started it yet (servers without
+    the gunicorn hook) or a failed attempt is due for a retry
+    """
+    if _due() and not _lock.locked():
+        threading.Thread(target=warm_up, args=(get_ml_checker,), name="warmup", daemon=True).start()
+
+
+def is_ready():
+    return _state["ready"]
+
+
+def status():
+    return {
+        "ready": _state["ready"],
+        "pid": os.getpid(),
+        "started_at": _state["started_at"],
+        "finished_at": _state["finished_at"],
+        "attempts": _state["attempts"],
+        "retry_in_seconds": (max(0.0, round(_state["retry_at"] - time.monotonic(), 1))
+                             if _state["retry_at"] is not None else None),
+        "steps": dict(_state["steps"]),
+    }
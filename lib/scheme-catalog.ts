@@ -0,0 +1,77 @@
+// Scheme catalog cached in localStorage and kept fresh with the backend's
+// delta feed (/api/schemes/changes), so each visit only downloads what
+// changed since the last one. The server's catalog epoch changes when its
+// catalog is rebuilt or restored; a different epoch (or a `reset` reply)
+// means the cached copy is dropped and the catalog is synced from scratch.
+
+const STORAGE_KEY = 'scheme_catalog'
+
+interface CachedCatalog {
+  revision: number
+  epoch?: string | null
+  schemes: Record<string, any>
+}
+
+interface ChangesPage {
+  revision: number
+  epoch: string | null
+  reset: boolean
+  has_more: boolean
+  schemes: any[]
+  deleted: string[]
+}
+
+function readCache(): CachedCatalog {
+  try {
+    const raw = localStorage.getItem(STORAGE_KEY)
+    if (raw) {
+      return JSON.parse(raw)
+    }
+  } catch (error) {
+    console.error('Error reading cached schemes:', error)
+  }
+  return { revision: 0, schemes: {} }
+}
+
+function writeCache(catalog: CachedCatalog) {
+  try {
+    localStorage.setItem(STORAGE_KEY, JSON.stringify(catalog))
+  } catch (error) {
+    console.error('Error caching schemes:', error)
+  }
+}
+
+export async function loadSchemeCatalog(api: string): Promise<any[]> {
+  const catalog = readCache()
+
+  let hasMore = true
+  while (hasMore) {
+    const response = await fetch(`${api}/api/schemes/changes?since=${catalog.revision}`)
+    if (!response.ok) {
+      throw new Error(`Failed to sync schemes (${response.status})`)
+    }
+    const page: ChangesPage = await response.json()
+
+    if (page.reset || (catalog.epoch !== undefined && page.epoch !== catalog.epoch)) {
+      catalog.revision = 0
+      catalog.epoch = page.epoch
+      catalog.schemes = {}
+      hasMore = true
+      continue
+    }
+    catalog.epoch = page.epoch
+
+    page.deleted.forEach((id) => {
+      delete catalog.schemes[id]
+    })
+    page.schemes.forEach((scheme) => {
+      catalog.schemes[scheme.id] = scheme
+    })
+
+    catalog.revision = page.revision
+    hasMore = page.has_more
+  }
+
+  writeCache(catalog)
+  return Object.values(catalog.schemes)
+}